@@ -1,10 +1,12 @@
 """Command line interface for operation management"""
+import os
 import click
 
 from poi_interlinking.processing.spatial.osm_utilities import download_osm_polygons
 from poi_interlinking.pre_processing import frequent_terms as ft
 from poi_interlinking.learning import parameters as pm
-from poi_interlinking import core
+from poi_interlinking import config, core, service
+from poi_interlinking.misc import writers
 
 
 @click.group(context_settings=dict(max_content_width=120, help_option_names=['-h', '--help']))
@@ -31,6 +33,13 @@ def freq_terms(train_set, encoding, exp_path):
     ft.extract_freqterms(train_set, encoding, exp_path)
 
 
+@cli.command('convert_dataset', help='convert a dataset to a Parquet or Arrow IPC file that is read without parsing')
+@click.option('--dataset', help='the dataset to convert.')
+@click.option('--out', help='the converted file, in the same folder, with a .parquet, .arrow or .feather extension.')
+def convert_dataset(dataset, out):
+    writers.save_pairs(os.path.join(config.default_data_path, dataset), os.path.join(config.default_data_path, out))
+
+
 @cli.command('learn_sim_params', help='learn parameters, i.e., weights/thresholds, on a train dataset for '
                                       'similarity metrics')
 @click.option('--train_set', default='dataset-string-similarity_global_1k.csv',
@@ -39,18 +48,37 @@ def freq_terms(train_set, encoding, exp_path):
               help='Group of similarities to train.')
 @click.option('--encoding', default='latin', show_default=True, type=click.Choice(['latin', 'global']),
               help='Specify the alphabet encoding of toponyms in dataset.')
-def learn_params(train_set, sim_type, encoding):
+@click.option('--out', help='JSON file to write the learned parameters to, e.g., to be used by the rules mode of the '
+                            'link command. Defaults to sim_params_<sim_type>[_<encoding>].json.')
+def learn_params(train_set, sim_type, encoding, out):
     if sim_type == 'lgm':
-        pm.learn_params_for_lgm(train_set, encoding)
-    else: pm.learn_thres(train_set, sim_type)
+        pm.learn_params_for_lgm(train_set, encoding, out)
+    else: pm.learn_thres(train_set, sim_type, out)
 
 
 @cli.command('tune', help='tune various classifiers and select the best hyper-parameters on a train dataset')
 @click.option('--dataset', default='', help='the dataset to train/evaluate the models.')
 @click.option('--encoding', default='latin', show_default=True, type=click.Choice(['latin', 'global']),
               help='Specify the alphabet encoding of toponyms in dataset.')
-def hyperparams_learn(dataset, encoding):
-    core.StrategyEvaluator(encoding).hyperparamTuning(dataset)
+@click.option('--bundle', help='folder to store the best model, trained on the whole dataset, along with its fitted '
+                               'feature extraction, to be used by the link command.')
+@click.option('--resume', is_flag=True,
+              help='skip the trials of the search that an interrupted run on the same dataset and feature '
+                   'configuration has already logged.')
+@click.option('--cascade', is_flag=True,
+              help='also store in the bundle a first stage on cheap features, which scores the pairs that it is '
+                   'confident of on its own, to be used by the --cascade option of link and serve.')
+def hyperparams_learn(dataset, encoding, bundle, resume, cascade):
+    core.StrategyEvaluator(encoding).hyperparamTuning(dataset, bundle, resume, cascade)
+
+
+@cli.command('select_features', help='select the cheapest subset of features that retains the effectiveness of a '
+                                     'classifier on a dataset')
+@click.option('--dataset', default='', help='the dataset to measure the cost of features and train the classifier.')
+@click.option('--encoding', default='latin', show_default=True, type=click.Choice(['latin', 'global']),
+              help='Specify the alphabet encoding of toponyms in dataset.')
+def select_features(dataset, encoding):
+    core.StrategyEvaluator(encoding).select_features(dataset)
 
 
 @cli.command('eval', help='evaluate the effectiveness of the proposed methods')
@@ -59,12 +87,48 @@ def hyperparams_learn(dataset, encoding):
 @click.option('--test_set', help='the dataset to evaluate the models.')
 @click.option('--encoding', default='latin', show_default=True, type=click.Choice(['latin', 'global']),
               help='Specify the encoding of toponyms in dataset.')
-@click.option('--is_build', is_flag=True, help='Whether loaded datasets contain raw data or already built features.')
-def eval_classifiers(dataset, train_set, test_set, is_build, encoding):
+@click.option('--is_build', is_flag=True, help='Whether loaded datasets contain raw data or already built features, '
+                                               'e.g., a features_build.npy file stored on a previous run.')
+@click.option('--bundle', help='folder to store the models, trained on the whole (train) dataset, along with their '
+                               'fitted feature extraction, to be used by the link command.')
+@click.option('--cascade', is_flag=True,
+              help='also store in the bundle a first stage on cheap features, which scores the pairs that it is '
+                   'confident of on its own, to be used by the --cascade option of link and serve.')
+def eval_classifiers(dataset, train_set, test_set, is_build, encoding, bundle, cascade):
     if train_set and test_set:
-        core.StrategyEvaluator(encoding).evaluate_on_pre_split(train_set, test_set, is_build)
+        core.StrategyEvaluator(encoding).evaluate_on_pre_split(train_set, test_set, is_build, bundle, cascade)
     else:
-        core.StrategyEvaluator(encoding).evaluate(dataset, is_build)
+        core.StrategyEvaluator(encoding).evaluate(dataset, is_build, bundle, cascade)
+
+
+@cli.command('link', help='score unlabeled POI pairs with a model bundle stored by the eval or tune commands, or '
+                          'with rules on learned similarity thresholds')
+@click.option('--dataset', help='the dataset of pairs to score.')
+@click.option('--bundle', help='folder of the stored model bundle.')
+@click.option('--out', default='scores.csv', show_default=True, help='file to write the scores of the pairs to.')
+@click.option('--classifier', help='the classifier of the bundle to use. Defaults to its first one.')
+@click.option('--cascade', is_flag=True,
+              help='build all features only for the pairs that the first stage stored in the bundle is uncertain of.')
+@click.option('--mode', default='model', show_default=True, type=click.Choice(['model', 'rules']),
+              help='score pairs with the bundle, or match them by the LGM-Sim scores of their names and the thresholds '
+                   'learned for them, without building features.')
+@click.option('--params', help='the parameters file of the learn_sim_params command for the lgm group, which the rules '
+                               'mode requires.')
+def link(dataset, bundle, out, classifier, cascade, mode, params):
+    core.StrategyEvaluator().link(dataset, bundle, out, classifier, cascade, mode, params)
+
+
+@cli.command('serve', help='serve a model bundle stored by the eval or tune commands, which scores POI pairs posted '
+                           'over HTTP in micro-batches')
+@click.option('--bundle', help='folder of the stored model bundle.')
+@click.option('--host', default='127.0.0.1', show_default=True, help='the host to listen on.')
+@click.option('--port', default=8000, show_default=True, help='the port to listen on.')
+@click.option('--socket', help='a Unix socket to listen on instead of host and port.')
+@click.option('--classifier', help='the classifier of the bundle to use. Defaults to its first one.')
+@click.option('--cascade', is_flag=True,
+              help='build all features only for the pairs that the first stage stored in the bundle is uncertain of.')
+def serve(bundle, host, port, socket, classifier, cascade):
+    service.serve(bundle, host, port, socket, classifier, cascade)
 
 
 cli.add_command(download)
@@ -20,6 +20,22 @@ use_cols = dict(
     s1='A.name', s2='B.name', addr1='A.addr', addr2='B.addr',
     status='class'
 )
+#: dict: The dtype, per key of :attr:`use_cols`, that each column is loaded as. Columns of *str* dtype are stored as
+#: :attr:`string_dtype`.
+col_dtypes = dict(
+    index='int64', ID1='str', ID2='str',
+    s1='str', s2='str', addr1='str', addr2='str',
+    lon1='float64', lat1='float64', lon2='float64', lat2='float64',
+    status='int8'
+)
+#: str: The compact storage of string columns (*string[pyarrow]* | *category*). *category* interns repeated values,
+#: e.g., names of POIs that take part in many pairs, whereas *string[pyarrow]* falls back to *category* when pyarrow
+#: is not installed.
+string_dtype = 'string[pyarrow]'
+#: int: Number of rows per batch when a dataset is streamed, e.g., on extracting frequent terms. Besides delimited text,
+#: datasets can be Parquet (*.parquet*) or Arrow IPC (*.arrow*, *.feather*) files, which are memory-mapped and read
+#: only for the required columns.
+batch_size = 100000
 all_cols = False
 delimiter = ','
 
@@ -35,6 +51,11 @@ delimiter = ','
 #: below the assigned threshold.
 sort_thres = 0.55
 
+#: str: Method to compute the distance between the coordinates of each POI pair. (*projected* | *haversine*).
+#: *projected* transforms the coordinates to epsg:3857 and computes the euclidean distance, whereas *haversine*
+#: computes the great-circle distance directly on the unprojected coordinates.
+distance_method = 'projected'
+
 #: int: Seed used by each of the random number generators.
 seed_no = 13
 
@@ -42,6 +63,45 @@ test_size = 0.2
 
 save_intermediate_results = True
 
+#: str: The dtype of built features (*float64* | *float32* | *uint16*). *uint16* quantizes the features, which lie in
+#: [0, 1], to 65536 levels, i.e., quarters the memory of the feature matrix and its per-fold copies. Tree ensembles are
+#: trained on the quantized codes, whereas the rest of the classifiers on their dequantized values.
+feature_dtype = 'float64'
+
+#: bool: Whether to reuse features previously built on the same dataset and feature configuration.
+use_feature_cache = True
+#: str: Relative path to the folder where built features are cached.
+cache_path = 'cache'
+#: int: Maximum size, in bytes, of the feature cache. The least recently used entries are evicted when exceeded.
+cache_max_size = 2 * 1024 ** 3
+#: bool: Whether to store the features of each pair by its IDs and content, so that only new or changed pairs are
+#: computed on subsequent builds. Requires the *ID1* and *ID2* columns in :attr:`use_cols`.
+use_feature_store = False
+#: str: Relative path to the folder of the feature store.
+feature_store_path = 'feature_store'
+#: str: Relative path to the folder where the trials of hyperparameter searches are logged, so that the *tune* command
+#: resumes an interrupted search with its *--resume* option.
+trial_log_path = 'trials'
+
+#: bool: Whether to record the wall time and number of calls of each stage of building features, e.g., address split,
+#: each similarity metric, LGM split and projection. The report is stored as *build_profile.json* in the experiment
+#: folder and summarized in a table.
+profile_features = False
+#: int: Allocations of each stage are traced on every such number of its calls. Stages called fewer times are not
+#: traced, e.g., set it to 1 to trace all of them. None disables tracing allocations.
+profile_alloc_sample_rate = 100
+
+#: int: Maximum number of pairs that the scoring service, i.e., the *serve* command, scores in one batch.
+service_max_batch_size = 64
+#: float: Maximum time, in seconds, that the scoring service waits for concurrent requests to fill a batch.
+service_max_wait = 0.002
+#: int: Number of the most recent requests that the scoring service reports latency percentiles on.
+service_latency_window = 10000
+#: bool: Whether the scoring service scores with the compiled trees of tree ensembles, see
+#: :class:`~poi_interlinking.learning.compiled_trees.CompiledTrees`, which avoid the per-call overhead of their models on
+#: small batches.
+service_compiled_trees = True
+
 
 class MLConf:
     """
@@ -59,6 +119,8 @@ class MLConf:
     :vartype RandomForest_hyperparameters: :obj:`dict`
     :cvar XGBoost_hyperparameters: Defines the search space for XGBoost.
     :vartype XGBoost_hyperparameters: :obj:`dict`
+    :cvar ApproxSVM_hyperparameters: Defines the search space for SVM on approximated kernels.
+    :vartype ApproxSVM_hyperparameters: :obj:`dict`
 
     These variables define the parameter grid for RandomizedSearchCV where continuous distributions are used for
     continuous parameters (whenever this is feasible):
@@ -73,6 +135,8 @@ class MLConf:
     :vartype RandomForest_hyperparameters_dist: :obj:`dict`
     :cvar XGBoost_hyperparameters_dist: Defines the search space for XGBoost.
     :vartype XGBoost_hyperparameters_dist: :obj:`dict`
+    :cvar ApproxSVM_hyperparameters_dist: Defines the search space for SVM on approximated kernels.
+    :vartype ApproxSVM_hyperparameters_dist: :obj:`dict`
     """
 
     kfold_no = 1
@@ -92,9 +156,9 @@ class MLConf:
     :class:`~poi_interlinking.processing.features.Features` : Details on the supported groups.
     """
 
-    # accepted values: randomized, grid, hyperband - not yet implemented!!!
+    # accepted values: randomized, grid, halving, warm
     hyperparams_search_method = 'randomized'
-    """str: Search Method to use for finding best hyperparameters. (*randomized* | *grid*).
+    """str: Search Method to use for finding best hyperparameters. (*randomized* | *grid* | *halving* | *warm*).
     
     See Also
     --------     
@@ -102,12 +166,94 @@ class MLConf:
         supported methods.        
     """
     #: int: Number of iterations that RandomizedSearchCV should execute. It applies only when
-    #: :attr:`hyperparams_search_method` equals to 'randomized'.
+    #: :attr:`hyperparams_search_method` equals to 'randomized', or the number of candidates that successive halving
+    #: starts with when it equals to 'halving', or the most candidates that a warm-started search evaluates when it
+    #: equals to 'warm'.
     max_iter = 300
 
+    #: dict: The budget that successive halving grows per classifier, as (parameter, min, max) values. Classifiers that
+    #: are not listed are budgeted on the number of train samples.
+    halving_resources = {
+        'RandomForest': ('n_estimators', 20, 1000),
+        'ExtraTrees': ('n_estimators', 20, 1000),
+        'XGBoost': ('n_estimators', 50, 2000),
+        'MLP': ('max_iter', 100, 10000),
+        'SVM': ('max_iter', 100, 10000),
+        'ApproxSVM': ('n_components', 30, 1000),
+    }
+    #: int: The proportion of candidates that successive halving promotes, and the growth of their budget, per round.
+    halving_factor = 3
+    #: bool: Whether to also run RandomizedSearchCV on the candidates of successive halving, so that the saving in
+    #: time to the best score is measured rather than estimated.
+    halving_compare_randomized = False
+
+    #: int: Number of boosting rounds without improvement on a held-out split of each train fold after which XGBoost
+    #: candidates stop boosting on tuning. Their ``n_estimators`` is the most rounds.
+    xgb_early_stopping_rounds = 30
+    #: float: The proportion of each train fold that is held out for early stopping XGBoost candidates.
+    xgb_validation_size = 0.1
+    #: str: The metric that XGBoost candidates are early stopped on.
+    xgb_eval_metric = 'logloss'
+
+    #: float: The relative width of the distributions that a warm-started search samples numeric hyperparameters from,
+    #: around their values in :attr:`clf_custom_params`, e.g., 0.5 samples ``n_estimators`` of 400 in [200, 600].
+    warm_start_width = 0.5
+    #: int: Number of candidates in a row that do not improve the best score before a warm-started search stops.
+    warm_start_patience = 10
+    #: float: The least improvement of the best score that a warm-started search does not consider a plateau.
+    warm_start_tol = 1e-3
+
     #: int: Number of ranked features to print
     max_features_to_show = 10
 
+    selected_features = None
+    """list of str: The features, out of :attr:`~poi_interlinking.helpers.StaticValues.final_cols`, to build. The rest
+    of them are not computed at all. ``None`` builds all the features of :attr:`classification_method`.
+
+    See Also
+    --------
+    :meth:`~poi_interlinking.core.StrategyEvaluator.select_features` : Selects a subset of features with respect to
+        their compute cost.
+    """
+
+    #: float: Max allowed drop of :attr:`score`, compared to using all features, for the selected subset of features.
+    feature_selection_max_loss = 0.005
+    #: float: Max allowed compute cost, in seconds per pair, of the selected subset of features. ``None`` for no limit.
+    feature_selection_max_latency = None
+    #: int: Number of pairs on which the compute cost of each feature is measured.
+    feature_selection_sample_size = 1000
+
+    #: dict: The cheap features, per classification group, that the first stage of a cascade scores all pairs on, see
+    #: :class:`~poi_interlinking.learning.cascade.CascadeScorer`. *Sorted_Damerau_Levenshtein* is 1.0 on pairs whose
+    #: canonical names are equal, whereas the *basic* group, which does not build it, falls back to
+    #: *Jaro_Winkler_sorted*.
+    cascade_features = {
+        'basic': ['street_numbers_diff', 'Damerau_Levenshtein', 'Jaro', 'Jaro_Winkler_sorted', 'point_dist'],
+        'basic_sorted': [
+            'street_numbers_diff', 'Damerau_Levenshtein', 'Jaro', 'Sorted_Damerau_Levenshtein', 'point_dist'
+        ],
+        'lgm': ['street_numbers_diff', 'Damerau_Levenshtein', 'Jaro', 'Sorted_Damerau_Levenshtein', 'point_dist'],
+    }
+    #: str: The classifier, out of :attr:`clf_custom_params`, of the first stage of a cascade.
+    cascade_classifier = 'ExtraTrees'
+    #: float: Max allowed drop of accuracy, compared to the classifier on all features, of the cascade on the training
+    #: pairs, to which its uncertainty band is tuned.
+    cascade_max_accuracy_loss = 0.002
+
+    #: list of str: The LGM-Sim metrics, e.g., ``['damerau_levenshtein', 'jaro_winkler']``, whose learned thresholds a
+    #: pair should all reach to match in the *rules* mode of *link*, see
+    #: :class:`~poi_interlinking.learning.rules.RuleMatcher`. None uses the most accurate one.
+    rule_metrics = None
+
+    #: int: Size, in bytes, of the feature matrix above which *evaluate* trains classifiers out of core, i.e., on chunks
+    #: of its memory-mapped rows, see :mod:`~poi_interlinking.learning.out_of_core`. Classifiers that cannot learn
+    #: incrementally are still trained on their materialized rows. None always trains in memory.
+    out_of_core_threshold = 4 * 1024 ** 3
+    #: int: Number of rows per chunk of out-of-core training and prediction.
+    out_of_core_chunk_size = 100000
+    #: int: Number of passes over the chunks that incremental classifiers, e.g., MLP, are trained with out of core.
+    out_of_core_epochs = 10
+
     classifiers = [
         # 'SVM',
         # 'DecisionTree',
@@ -124,6 +270,8 @@ class MLConf:
     - ExtraTrees
     - XGBoost
     - MLP
+    - ApproxSVM, i.e., an SVM on random features that approximate its kernel, which scales to millions of pairs,
+      see :class:`~poi_interlinking.learning.approx_svm.ApproxSVC`
     """
 
     # score = 'roc_auc_ovr_weighted'
@@ -182,6 +330,11 @@ class MLConf:
             'solver': 'sgd', 'tol': 0.0001,
             'random_state': seed_no,
         },
+        'ApproxSVM': {
+            'kernel': 'rbf', 'gamma': 0.01, 'C': 100, 'n_components': 300, 'approximation': 'nystroem',
+            'class_weight': 'balanced',
+            'random_state': seed_no,
+        },
     }
 
     sim_opt_params = {
@@ -230,7 +383,7 @@ class MLConf:
             'C': [0.01, 0.1, 1, 10, 25, 50, 100, 300],
             'max_iter': [10000],
             'class_weight': ['balanced', {0: 1, 1: 3}, {0: 1, 1: 5}],
-            'probability': True
+            'probability': [True]
         },
         {
             'kernel': ['poly'],
@@ -239,7 +392,7 @@ class MLConf:
             'C': [0.01, 0.1, 1, 10, 25, 50, 100],
             'max_iter': [30000],
             'class_weight': ['balanced', {0: 1, 1: 3}, {0: 1, 1: 5}],
-            'probability': True
+            'probability': [True]
         },
     ]
     DecisionTree_hyperparameters = {
@@ -284,6 +437,13 @@ class MLConf:
         'activation': ['identity', 'logistic', 'tanh', 'relu'],
         'tol': [1e-3, 1e-4],
     }
+    ApproxSVM_hyperparameters = {
+        'kernel': ['rbf', 'sigmoid'],
+        'gamma': [1e-3, 1e-2, 0.1, 1],
+        'C': [0.1, 1, 10, 100, 300],
+        'n_components': [300],
+        'class_weight': ['balanced', {0: 1, 1: 3}],
+    }
 
     # These parameters constitute the search space for RandomizedSearchCV in our experiments.
     SVM_hyperparameters_dist = {
@@ -291,7 +451,7 @@ class MLConf:
         'kernel': ['rbf'],
         'class_weight': ['balanced'],
         'max_iter': [10000],
-        'probability': True
+        'probability': [True]
     }
     DecisionTree_hyperparameters_dist = {
         'max_depth': sp_randint(10, 200),
@@ -333,6 +493,12 @@ class MLConf:
         'activation': ['identity', 'logistic', 'tanh', 'relu'],
         'tol': [1e-3, 1e-4],
     }
+    ApproxSVM_hyperparameters_dist = {
+        'C': expon(scale=100), 'gamma': expon(scale=.1),
+        'kernel': ['rbf', 'sigmoid'],
+        'n_components': sp_randint(100, 1000),
+        'class_weight': ['balanced'],
+    }
 
     # RandomForest_hyperparameters_hp = {
     #     'max_depth': hp.choice('max_depth', range(1,20)),
@@ -4,18 +4,27 @@
 
 import time
 import os
+from functools import partial
 from sklearn.model_selection import train_test_split, StratifiedShuffleSplit
+from sklearn.base import clone
 from shutil import copyfile
 from datetime import datetime
 import numpy as np
 from collections import defaultdict
 from beautifultable import BeautifulTable
+from joblib import Parallel, delayed, effective_n_jobs, parallel_config
 
 from poi_interlinking import config, helpers
-from poi_interlinking.learning import hyperparam_tuning
+from poi_interlinking.learning import hyperparam_tuning, feature_selection, out_of_core
+from poi_interlinking.learning.bundle import ModelBundle
+from poi_interlinking.learning.cascade import CascadeScorer
+from poi_interlinking.learning.rules import RuleMatcher
+from poi_interlinking.learning.trials import TrialLog
 from poi_interlinking.processing.features import Features
 from poi_interlinking.processing.sim_measures import LGMSimVars
-from poi_interlinking.misc import writers
+from poi_interlinking.processing.transformer import PairFeatures
+from poi_interlinking.misc import readers, writers
+from poi_interlinking.misc.profiling import profiler
 
 
 class StrategyEvaluator:
@@ -25,12 +34,21 @@ class StrategyEvaluator:
     def __init__(self, encoding='latin'):
         self.encoding = encoding
 
-    def hyperparamTuning(self, dataset):
+    def hyperparamTuning(self, dataset, bundle=None, resume=False, cascade=False):
         """A complete process of distinct steps in figuring out the best ML algorithm with optimal hyperparameters that
         fit the ``dataset`` for the toponym interlinking problem.
 
         :param dataset: Name of the dataset to use for training and evaluating various classifiers.
         :type dataset: str
+        :param bundle: Folder to store a :class:`~poi_interlinking.learning.bundle.ModelBundle` of the best classifier,
+            trained on the whole ``dataset``.
+        :type bundle: str
+        :param resume: Whether to skip the trials of the search already logged by a previous run on the same dataset
+            and feature configuration, see :class:`~poi_interlinking.learning.trials.TrialLog`.
+        :type resume: bool
+        :param cascade: Whether to also store in the bundle the first stage of a cascade, see
+            :class:`~poi_interlinking.learning.cascade.CascadeScorer`.
+        :type cascade: bool
         """
         tot_time = time.time()
 
@@ -47,6 +65,11 @@ class StrategyEvaluator:
         print("Loaded dataset and build features for {} setup; {} sec.".format(
             config.MLConf.classification_method, time.time() - start_time))
 
+        trials = TrialLog(
+            TrialLog.key(f.fname, LGMSimVars.freq_files, self.encoding, f.clf_method, pt.outer_cv.get_n_splits()),
+            resume
+        )
+
         skf = StratifiedShuffleSplit(n_splits=1, random_state=config.seed_no, test_size=config.test_size)
         for train_idxs, test_idxs in skf.split(fX, y):
             fX_train, fX_test = fX[train_idxs], fX[test_idxs]
@@ -54,7 +77,7 @@ class StrategyEvaluator:
 
             start_time = time.time()
             # 1st phase: find out best classifier from a list of candidate ones
-            best_clf = pt.fineTuneClassifiers(fX_train, y_train)
+            best_clf = pt.fineTuneClassifiers(fX_train, y_train, trials)
             print("Best classifier {} with hyperparams {} and score {}; {} sec.".format(
                 best_clf['classifier'], best_clf['hyperparams'], best_clf['score'], time.time() - start_time)
             )
@@ -75,15 +98,33 @@ class StrategyEvaluator:
             )
             self._print_stats(res)
 
+            if bundle:
+                self._save_bundle(
+                    bundle, f, fX, y, {best_clf['classifier']: clone(best_clf['estimator'])}, cascade=cascade
+                )
+
         print("The whole process took {} sec.".format(time.time() - tot_time))
 
-    def evaluate(self, dataset, is_build=False):
+    def evaluate(self, dataset, is_build=False, bundle=None, cascade=False):
         """Train and evaluate supported ML algorithms with custom hyper-parameters on dataset.
 
+        Each classifier is trained and tested on each fold as a separate task. The tasks run on a pool of processes
+        that share the features through a memory-mapped file, whereas the processors of
+        :attr:`~poi_interlinking.config.MLConf.n_jobs` are split among them. Features that exceed
+        :attr:`~poi_interlinking.config.MLConf.out_of_core_threshold` are trained on out of core, see
+        :mod:`~poi_interlinking.learning.out_of_core`.
+
         :param dataset: Name of the dataset to use for training and evaluating various classifiers.
         :type dataset: str
+        :param bundle: Folder to store a :class:`~poi_interlinking.learning.bundle.ModelBundle` of the classifiers,
+            trained on the whole ``dataset``.
+        :type bundle: str
+        :param cascade: Whether to also store in the bundle the first stage of a cascade, see
+            :class:`~poi_interlinking.learning.cascade.CascadeScorer`.
+        :type cascade: bool
         """
         tot_time = time.time()
+        assert not (bundle and is_build), 'A model bundle cannot be stored for datasets of pre-built features'
 
         # Create folder to store experiments
         date_time = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
@@ -104,98 +145,72 @@ class StrategyEvaluator:
             fX, y = f.build()
             print("Loaded dataset and build features for {} setup; {} sec.".format(
                 config.MLConf.classification_method, time.time() - start_time))
+            self._save_profile(exp_folder)
 
             if config.save_intermediate_results:
-                writers.save_features(
-                    os.path.join(exp_folder, 'features_build.csv'),
-                    np.concatenate((
-                        f.get_index_col()[:, np.newaxis], fX, y[:, np.newaxis]
-                    ), axis=1))
+                writers.save_features(os.path.join(exp_folder, 'features_build.npy'), f.get_index_col(), fX, y)
         else:
-            tmp_df = f.get_loaded_data()
-            y = tmp_df[config.use_cols['status']].to_numpy()
-            tmp_df.drop(columns=[config.use_cols['status'], config.use_cols['index']], inplace=True)
-            fX = tmp_df.to_numpy()
+            fX, y = f.get_built_features()
             print("Loaded dataset with pre-built features; {} sec.".format(time.time() - start_time))
 
         # fX_train, fX_test, y_train, y_test, train_set_df, test_set_df = train_test_split(
         #     fX, y, f.get_loaded_data(), stratify=y, test_size=config.test_size, random_state=config.seed_no)
         skf = StratifiedShuffleSplit(n_splits=config.MLConf.kfold_no, random_state=config.seed_no,
                                      test_size=config.test_size)
-        fold = 1
+        splits = list(skf.split(fX, y))
+
+        fold_paths = []
+        for fold in range(1, len(splits) + 1):
+            fold_paths.append(os.path.join(exp_folder, f'fold_{fold}'))
+            if config.save_intermediate_results: os.makedirs(fold_paths[-1])
+
+            # if not is_build:
+            #     train_set_df.reset_index(drop=True).to_csv(os.path.join(fold_path, 'train.csv'), index=True,
+            #                                                index_label='index')
+            #     test_set_df.reset_index(drop=True).to_csv(os.path.join(fold_path, 'test.csv'), index=True,
+            #                                               index_label='index')
+
+        # each classifier is trained on each fold as a separate task
+        tasks = [(fold, clf) for fold in range(len(splits)) for clf in config.MLConf.clf_custom_params]
+        workers, n_jobs = self._task_shares(len(tasks))
+        print(f'Evaluating {len(tasks)} fold/classifier tasks on {workers} processes with {n_jobs} jobs each...')
+
+        # features that exceed the memory threshold are trained on out of core, i.e., in chunks of the mapped file
+        shared_fX = self._shared_features(fX, exp_folder) if workers > 1 or out_of_core.exceeds(fX) else fX
+        if out_of_core.exceeds(fX):
+            print(f'The features take {fX.nbytes / 1024 ** 2:.1f} MiB, i.e., exceed the out-of-core threshold; '
+                  f'classifiers are trained on chunks of {config.MLConf.out_of_core_chunk_size} rows.')
+        with parallel_config(backend='loky', inner_max_num_threads=n_jobs):
+            outputs = Parallel(n_jobs=workers)(
+                delayed(_fit_and_test)(
+                    shared_fX, y, *splits[fold], pt.clf_names[clf][0](**config.MLConf.clf_custom_params[clf]), n_jobs,
+                    config.save_intermediate_results
+                ) for fold, clf in tasks
+            )
+        if shared_fX is not fX: os.remove(shared_fX.filename)
 
+        # results are aggregated in the order of the tasks, regardless of which one finished first
         res = dict()
-        for train_idxs, test_idxs in skf.split(fX, y):
-            print(f'Evaluating models on fold {fold}...')
-            # fX_train, fX_test, train_set_df = fX[train_idxs], fX[test_idxs], f.get_loaded_data().iloc[train_idxs]
-            fX_train, fX_test = fX[train_idxs], fX[test_idxs]
-            y_train, y_test, _ = y[train_idxs], y[test_idxs], f.get_loaded_data().iloc[test_idxs]
+        for (fold, clf), out in zip(tasks, outputs):
+            train_idxs, test_idxs = splits[fold]
+            print(f"Finished training {clf} model on fold {fold + 1};"
+                  f"{out['depth']}"
+                  f"{out['train_time']} sec.")
 
             if config.save_intermediate_results:
-                fold_path = os.path.join(exp_folder, f'fold_{fold}')
-                os.makedirs(fold_path)
-            #
-            #     writers.save_features(
-            #         os.path.join(fold_path, 'train_features_build.csv'),
-            #         np.concatenate((
-            #             (train_idxs + 1)[:, np.newaxis], fX_train, y_train[:, np.newaxis]
-            #         ), axis=1))
-            #     writers.save_features(
-            #         os.path.join(fold_path, 'test_features_build.csv'),
-            #         np.concatenate((
-            #             (test_idxs + 1)[:, np.newaxis], fX_test, y_test[:, np.newaxis]
-            #         ), axis=1))
-
-                # if not is_build:
-                #     train_set_df.reset_index(drop=True).to_csv(os.path.join(fold_path, 'train.csv'), index=True,
-                #                                                index_label='index')
-                #     test_set_df.reset_index(drop=True).to_csv(os.path.join(fold_path, 'test.csv'), index=True,
-                #                                               index_label='index')
-
-            for clf in config.MLConf.clf_custom_params:
-                start_time = time.time()
-                # 1st phase: train each classifier on the whole train dataset (no folds)
-                estimator = pt.clf_names[clf][0](**config.MLConf.clf_custom_params[clf])
-                estimator = pt.trainClassifier(fX_train, y_train, estimator)
-                decision_tree_depth = f"tree reached depth of {estimator.get_depth()};" \
-                    if hasattr(estimator, 'get_depth') else ''
-                print(f"Finished training {clf} model;"
-                      f"{decision_tree_depth}"
-                      f"{time.time() - start_time} sec.")
-
-                # start_time = time.time()
-                # 2nd phase: test each classifier on the test dataset
-                metrics = pt.testClassifier(fX_test, y_test, estimator)
-
-                if config.save_intermediate_results:
-                    writers.save_features(
-                        os.path.join(fold_path, f'train_proba_{clf}.csv'),
-                        np.concatenate((
-                            f.get_index_col()[train_idxs][:, np.newaxis], estimator.predict_proba(fX_train),
-                            estimator.predict(fX_train)[:, np.newaxis]  # , y_train[:, np.newaxis]
-                        ), axis=1),
-                        cols=['prob_class_0', 'prob_class_1', 'pred_class']
-                    )
+                for name, idxs, (proba, pred) in [('train', train_idxs, out['train_proba']),
+                                                  ('test', test_idxs, out['test_proba'])]:
                     writers.save_features(
-                        os.path.join(fold_path, f'test_proba_{clf}.csv'),
-                        np.concatenate((
-                            f.get_index_col()[test_idxs][:, np.newaxis], estimator.predict_proba(fX_test),
-                            estimator.predict(fX_test)[:, np.newaxis]  # , y_test[:, np.newaxis]
-                        ), axis=1),
-                        cols=['prob_class_0', 'prob_class_1', 'pred_class']
+                        os.path.join(fold_paths[fold], f'{name}_proba_{clf}.npy'), f.get_index_col()[idxs],
+                        proba, pred, cols=['prob_class_0', 'prob_class_1'], label_col='pred_class'
                     )
 
-                if clf not in res: res[clf] = defaultdict(list)
-                for m, v in metrics.items():
-                    res[clf][m].append(v)
-                res[clf]['time'].append(time.time() - start_time)
-
-                if hasattr(estimator, 'feature_importances_'):
-                    res[clf]['fimportances'].append(estimator.feature_importances_)
-                elif hasattr(estimator, 'coef_'):
-                    res[clf]['fimportances'].append(estimator.coef_)
+            if clf not in res: res[clf] = defaultdict(list)
+            for m, v in out['metrics'].items():
+                res[clf][m].append(v)
+            res[clf]['time'].append(out['time'])
 
-            fold += 1
+            if out['fimportances'] is not None: res[clf]['fimportances'].append(out['fimportances'])
 
         for clf, metrics in res.items():
             print('Method {}'.format(clf))
@@ -211,15 +226,28 @@ class StrategyEvaluator:
             self._print_stats(dict(Classifier=clf, **output))
             writers.write_results(os.path.join(exp_folder, 'output.csv'), dict(Classifier=clf, **output))
 
+        if bundle:
+            self._save_bundle(bundle, f, fX, y, {
+                clf: pt.clf_names[clf][0](**config.MLConf.clf_custom_params[clf])
+                for clf in config.MLConf.clf_custom_params
+            }, cascade=cascade)
+
         print("The whole process took {} sec.\n".format(time.time() - tot_time))
 
-    def evaluate_on_pre_split(self, dtrain, dtest, is_build=False):
+    def evaluate_on_pre_split(self, dtrain, dtest, is_build=False, bundle=None, cascade=False):
         """Train and evaluate supported ML algorithms with custom hyper-parameters on dataset.
 
         :param dataset: Name of the dataset to use for training and evaluating various classifiers.
         :type dataset: str
+        :param bundle: Folder to store a :class:`~poi_interlinking.learning.bundle.ModelBundle` of the classifiers
+            trained on ``dtrain``.
+        :type bundle: str
+        :param cascade: Whether to also store in the bundle the first stage of a cascade, see
+            :class:`~poi_interlinking.learning.cascade.CascadeScorer`.
+        :type cascade: bool
         """
         tot_time = time.time()
+        assert not (bundle and is_build), 'A model bundle cannot be stored for datasets of pre-built features'
 
         # Create folder to store experiments
         date_time = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
@@ -241,16 +269,15 @@ class StrategyEvaluator:
             print("Loaded train dataset {} and build features for {} setup; {} sec.".format(
                 dtrain, config.MLConf.classification_method, time.time() - start_time))
         else:
-            tmp_df = f.get_loaded_data()
-            y_train = tmp_df[config.use_cols['status']].to_numpy()
-            tmp_df.drop(columns=[config.use_cols['status'], config.use_cols['index']], inplace=True)
-            fX_train = tmp_df.to_numpy()
+            fX_train, y_train = f.get_built_features()
             print("Loaded train dataset {} with pre-built features; {} sec.".format(dtrain, time.time() - start_time))
 
         print(f'Using {(100 - config.test_size) * 100}% of the training dataset.')
         skf = StratifiedShuffleSplit(n_splits=1, random_state=config.seed_no, test_size=config.test_size)
         for train_idxs, test_idxs in skf.split(fX_train, y_train):
             fX_train, y_train = fX_train[train_idxs], y_train[train_idxs]
+        # the bundle, i.e., its scalers and cascade, is fitted on the same train rows as the classifiers
+        train_pairs = f.get_loaded_data().take(train_idxs)
 
         start_time = time.time()
         assert (os.path.isfile(os.path.join(config.default_data_path, dtest))), \
@@ -260,11 +287,9 @@ class StrategyEvaluator:
             fX_test, y_test = f.build()
             print("Loaded test dataset {} and build features for {} setup; {} sec.".format(
                 dtest, config.MLConf.classification_method, time.time() - start_time))
+            self._save_profile(exp_folder)
         else:
-            tmp_df = f.get_loaded_data()
-            y_test = tmp_df[config.use_cols['status']].to_numpy()
-            tmp_df.drop(columns=[config.use_cols['status'], config.use_cols['index']], inplace=True)
-            fX_test = tmp_df.to_numpy()
+            fX_test, y_test = f.get_built_features()
             print("Loaded test dataset {} with pre-built features; {} sec.".format(dtest, time.time() - start_time))
 
         res = dict()
@@ -306,12 +331,177 @@ class StrategyEvaluator:
             self._print_stats(dict(Classifier=clf, **output))
             writers.write_results(os.path.join(exp_folder, 'output.csv'), dict(Classifier=clf, **output))
 
+        if bundle:
+            self._save_bundle(bundle, f, fX_train, y_train, {
+                clf: pt.clf_names[clf][0](**config.MLConf.clf_custom_params[clf])
+                for clf in config.MLConf.clf_custom_params
+            }, train_pairs, cascade)
+
         print("The whole process took {} sec.\n".format(time.time() - tot_time))
 
+    def link(self, dataset, bundle, out, clf=None, cascade=False, mode='model', params=None):
+        """Score the unlabeled POI pairs of ``dataset`` with a stored model bundle, without any retraining, or with
+        rules on the LGM-Sim scores of their names, see :class:`~poi_interlinking.learning.rules.RuleMatcher`.
+
+        The dataset is streamed in batches of :attr:`~poi_interlinking.config.batch_size` pairs, whose features are
+        built with the fitted feature step of the bundle, and the scores of each batch are appended to ``out``.
+
+        :param dataset: Name of the dataset to score.
+        :type dataset: str
+        :param bundle: Folder of a :class:`~poi_interlinking.learning.bundle.ModelBundle` stored on *eval* or *tune*.
+        :type bundle: str
+        :param out: Path of the file to write the scores to.
+        :type out: str
+        :param clf: Name of the classifier of the bundle to use. Defaults to its first one.
+        :type clf: str
+        :param cascade: Whether to build all features only for the pairs that the first stage of the cascade of the
+            bundle is uncertain of, see :class:`~poi_interlinking.learning.cascade.CascadeScorer`.
+        :type cascade: bool
+        :param mode: Whether to score with the bundle (*model*) or with rules (*rules*).
+        :type mode: str
+        :param params: The file of the parameters learned by the *learn_sim_params* command for the *lgm* group,
+            which the rules use.
+        :type params: str
+        """
+        tot_time = time.time()
+
+        fpath = os.path.join(config.default_data_path, dataset)
+        assert os.path.isfile(fpath), f'{fpath} dataset does not exist!!!'
+
+        if mode == 'rules':
+            assert params is not None, 'The rules require the parameters file of the learn_sim_params command'
+            rules = RuleMatcher(readers.read_sim_params(params))
+            LGMSimVars().load_freq_terms(rules.params['encoding'])
+            print(f'Matching pairs whose LGM-Sim scores on {rules.metrics} reach their thresholds')
+            required, predict_proba = ['index', 's1', 's2'], rules.predict_proba
+        else:
+            b = ModelBundle.load(bundle)
+            required, predict_proba = b.features.required_cols(), partial(b.predict_proba, clf=clf, cascade=cascade)
+
+        scored = 0
+        for df in readers.iter_pairs(fpath, required):
+            start_time = time.time()
+            proba = predict_proba(df)
+            writers.write_scores(
+                out, df[config.use_cols['index']].to_numpy(), proba, append=scored > 0,
+                pred=(proba[:, 1] >= 0.5).astype(int) if mode == 'rules' else None
+            )
+            scored += len(df.index)
+            print(f'Scored {scored} pairs; {time.time() - start_time} sec.')
+
+        if mode != 'rules' and cascade:
+            print(f'Escalated {b.cascade.escalated} out of {b.cascade.scored} pairs '
+                  f'({b.cascade.escalated / max(b.cascade.scored, 1):.2%}) to all features')
+        print(f'Scores are stored in {out}')
+        print("The whole process took {} sec.\n".format(time.time() - tot_time))
+
+    def select_features(self, dataset):
+        """Select the cheapest subset of features, with respect to their compute cost, that retains the effectiveness
+        of the first classifier in :attr:`~poi_interlinking.config.MLConf.classifiers` on the ``dataset``.
+
+        The selected features are printed in order to be assigned to
+        :attr:`~poi_interlinking.config.MLConf.selected_features`, so that only these are computed thereafter.
+
+        :param dataset: Name of the dataset to use for measuring the cost of features and training the classifier.
+        :type dataset: str
+        """
+        tot_time = time.time()
+
+        assert config.MLConf.selected_features is None, \
+            'Features are selected out of all the features; unset config.MLConf.selected_features'
+        LGMSimVars.per_metric_optValues = config.MLConf.sim_opt_params[self.encoding.lower()]
+
+        f = Features()
+        pt = hyperparam_tuning.ParamTuning()
+
+        start_time = time.time()
+        assert (os.path.isfile(os.path.join(config.default_data_path, dataset))), \
+            f'{os.path.join(config.default_data_path, dataset)} dataset does not exist!!!'
+        f.load_data(os.path.join(config.default_data_path, dataset), self.encoding)
+        fX, y = f.build()
+        print("Loaded dataset and build features for {} setup; {} sec.".format(
+            config.MLConf.classification_method, time.time() - start_time))
+
+        start_time = time.time()
+        costs = f.feature_costs(config.MLConf.feature_selection_sample_size)
+        print("Measured the compute cost of features; {} sec.".format(time.time() - start_time))
+
+        clf = config.MLConf.classifiers[0]
+        estimator = pt.clf_names[clf][0](**config.MLConf.clf_custom_params[clf])
+        fX = pt.model_input(fX, estimator)
+        skf = StratifiedShuffleSplit(n_splits=1, random_state=config.seed_no, test_size=config.test_size)
+        for train_idxs, test_idxs in skf.split(fX, y):
+            res = feature_selection.select_features(
+                estimator, fX[train_idxs], y[train_idxs], fX[test_idxs], y[test_idxs], costs)
+
+        table = BeautifulTable()
+        table.columns.header = ["name", "importance", "cost (ms)", "selected"]
+        for feature_name, importance, cost, selected in zip(f.feature_cols(), res['importances'], costs, res['selected']):
+            table.rows.append([feature_name, importance, cost * 1000, selected])
+        table.set_style(BeautifulTable.STYLE_RST)
+        print(table)
+
+        print(f'{clf} scores {res["score"]} ({config.MLConf.score}) with {res["cost"] * 1000} ms per pair on the '
+              f'{np.count_nonzero(res["selected"])} selected features, compared to {res["full_score"]} with '
+              f'{res["full_cost"] * 1000} ms per pair on all {len(costs)} features.')
+        print(f'selected_features = {np.asarray(f.feature_cols())[res["selected"]].tolist()}')
+
+        print("The whole process took {} sec.\n".format(time.time() - tot_time))
+
+    def _save_bundle(self, path, f, fX, y, models, pairs=None, cascade=False):
+        """Train ``models`` on the whole ``fX`` and store them in a bundle along with a feature step, fitted on the
+        loaded pairs of ``f`` or ``pairs``, which scales features as they are built on ``fX``, and the first stage of
+        a cascade if ``cascade`` is set.
+        """
+        start_time = time.time()
+        pt = hyperparam_tuning.ParamTuning()
+        if pairs is None: pairs = f.get_loaded_data()
+
+        features = PairFeatures(clf_method=f.clf_method, encoding=self.encoding, selected_features=f.selected_features)
+        features.fit(pairs)
+
+        scorer = CascadeScorer().fit(pairs, y, fX, models, self.encoding, f.clf_method) if cascade else None
+
+        models = {clf: pt.trainClassifier(fX, y, estimator) for clf, estimator in models.items()}
+        ModelBundle(features, models, cascade=scorer).compile(fX).save(path)
+        print(f"Trained the models of the bundle on the whole dataset; {time.time() - start_time} sec.")
+
+    @staticmethod
+    def _task_shares(n_tasks):
+        """Split the processors of :attr:`~poi_interlinking.config.MLConf.n_jobs` among ``n_tasks`` concurrent tasks.
+
+        Returns
+        -------
+        tuple of (int, int)
+            The number of tasks that run in parallel and the number of jobs, e.g., threads, of each one.
+        """
+        cpus = effective_n_jobs(config.MLConf.n_jobs)
+        workers = max(min(n_tasks, cpus), 1)
+        return workers, max(cpus // workers, 1)
+
+    @staticmethod
+    def _shared_features(fX, exp_folder):
+        """Return ``fX`` as a read-only memory-mapped file, which worker processes open instead of receiving a copy."""
+        if isinstance(fX, np.memmap): return fX
+
+        fpath = os.path.join(exp_folder, 'features_shared.npy')
+        np.save(fpath, fX)
+        return np.load(fpath, mmap_mode='r')
+
+    @staticmethod
+    def _save_profile(exp_folder):
+        if not config.profile_features: return
+
+        fpath = os.path.join(exp_folder, 'build_profile.json')
+        profiler.save(fpath)
+        print(f'Time spent per stage of building features, also stored in {fpath}:')
+        print(profiler.summary())
+
     @staticmethod
     def _print_stats(params):
         print('|', '\t& '.join(helpers.Printing.cols.keys()))
-        print('||', '\t& '.join(map(str, [params[v] for _, v in helpers.Printing.cols.items()])))
+        # the std of F1 is available only on evaluating more than one fold
+        print('||', '\t& '.join(map(str, [params.get(v, '-') for _, v in helpers.Printing.cols.items()])))
 
         if 'fimportances' in params and params['fimportances'] is not None:
             importances = np.ma.masked_equal(params['fimportances'], 0.0)
@@ -333,3 +523,47 @@ class StrategyEvaluator:
             print(table)
 
         print()
+
+
+def _fit_and_test(fX, y, train_idxs, test_idxs, estimator, n_jobs=None, proba=False):
+    """Train ``estimator`` on the ``train_idxs`` rows of ``fX`` and test it on the ``test_idxs`` ones, i.e., a task of
+    :meth:`StrategyEvaluator.evaluate` that runs in a worker process.
+
+    The rows are sliced by the classifier, so that ``fX`` that exceeds
+    :attr:`~poi_interlinking.config.MLConf.out_of_core_threshold` is trained and tested on out of core.
+
+    Returns
+    -------
+    dict
+        The test metrics, the training time, the total time, the feature importances and, if ``proba`` is True, the
+        predicted probabilities and classes on the train and test rows.
+    """
+    start_time = time.time()
+    pt = hyperparam_tuning.ParamTuning()
+
+    # 1st phase: train each classifier on the whole train dataset (no folds)
+    estimator = pt.trainClassifier(fX, y, estimator, n_jobs, idxs=train_idxs)
+    out = dict(
+        train_time=time.time() - start_time,
+        depth=f"tree reached depth of {estimator.get_depth()};" if hasattr(estimator, 'get_depth') else '',
+    )
+
+    # 2nd phase: test each classifier on the test dataset
+    out['metrics'] = pt.testClassifier(fX, y, estimator, idxs=test_idxs)
+
+    if proba:
+        for name, idxs in [('train', train_idxs), ('test', test_idxs)]:
+            if out_of_core.exceeds(fX):
+                out[f'{name}_proba'] = out_of_core.predict_chunks(estimator, fX, idxs, pt.model_input)
+            else:
+                X = pt.model_input(fX[idxs], estimator)
+                out[f'{name}_proba'] = (estimator.predict_proba(X), estimator.predict(X))
+
+    out['fimportances'] = None
+    if hasattr(estimator, 'feature_importances_'):
+        out['fimportances'] = estimator.feature_importances_
+    elif hasattr(estimator, 'coef_'):
+        out['fimportances'] = estimator.coef_
+
+    out['time'] = time.time() - start_time
+    return out
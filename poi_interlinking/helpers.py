@@ -11,6 +11,7 @@ from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem.snowball import SnowballStemmer
 import pycountry
+import numpy as np
 from langdetect import detect, lang_detect_exception
 
 from poi_interlinking import config
@@ -150,6 +151,48 @@ def getBasePath():
     return os.path.abspath(os.path.dirname(__main__.__file__))
 
 
+def quantization_scale(dtype):
+    """Return the value of one quantization step of features stored as unsigned integers of ``dtype``, which map the
+    [0, 1] range to all of their codes, or None for floating point dtypes.
+    """
+    dtype = np.dtype(dtype)
+    return 1 / np.iinfo(dtype).max if dtype.kind == 'u' else None
+
+
+def to_feature_dtype(fX, dtype=None):
+    """Convert built features, whose values lie in [0, 1], to ``dtype``.
+
+    Parameters
+    ----------
+    fX: ndarray
+        The built features.
+    dtype: str, optional
+        The target dtype. Defaults to :attr:`~poi_interlinking.config.feature_dtype`.
+
+    Returns
+    -------
+    ndarray
+        The features as floats or, in case of an unsigned integer dtype, quantized to the codes of
+        :func:`quantization_scale`.
+    """
+    dtype = np.dtype(config.feature_dtype if dtype is None else dtype)
+    scale = quantization_scale(dtype)
+    if scale is None: return fX.astype(dtype, copy=False)
+
+    assert not np.isnan(fX).any(), f'Features with missing values cannot be quantized to {dtype}'
+    return np.rint(np.clip(fX, 0, 1) / scale).astype(dtype)
+
+
+def dequantize(fX):
+    """Return the float32 values of quantized features, or ``fX`` itself if they are already floats."""
+    scale = quantization_scale(fX.dtype)
+    if scale is None: return fX
+
+    values = fX.astype(np.float32)
+    values *= np.float32(scale)
+    return values
+
+
 class Printing:
     cols = {
         'Method': 'Classifier',
@@ -228,7 +271,14 @@ class StaticValues:
         'tuned_jaro_winkler_reversed': ['basic', 'sorted', 'lgm'],
     }
 
-    def __init__(self, sim_type='basic'):
+    #: set of str: The metrics, out of :attr:`sim_metrics`, that score the same regardless of the order of compared
+    #: strings. The LGM-Sim variations inherit the symmetry of their internal metric.
+    symmetric_metrics = {
+        'damerau_levenshtein', 'jaro', 'jaro_winkler', 'jaro_winkler_reversed', 'sorted_winkler', 'cosine', 'jaccard',
+        'strike_a_match', 'monge_elkan', 'soft_jaccard',
+    }
+
+    def __init__(self, sim_type='basic', selected_only=True):
         del self.final_cols[:]
 
         if sim_type == 'lgm':
@@ -247,7 +297,7 @@ class StaticValues:
 
             self.final_cols += self.spatial_feature_cols
             if config.all_cols: self.final_cols += self.extra_feature_cols
-        elif sim_type == 'sorted':
+        elif sim_type in ['sorted', 'basic_sorted']:
             # self.final_cols += self.address_feature_cols + [
             #     f'{x}_{y}_on_street_names' for x in ['Sorted']
             #     for y in self.sim_features_cols if y.lower() != 'jaro_winkler_sorted'
@@ -264,3 +314,6 @@ class StaticValues:
         else:  # basic or whatever
             self.final_cols = self.address_feature_cols + self.sim_features_cols + self.spatial_feature_cols
             if config.all_cols: self.final_cols += self.extra_feature_cols
+
+        if selected_only and config.MLConf.selected_features is not None:
+            self.final_cols = [c for c in self.final_cols if c in config.MLConf.selected_features]
@@ -0,0 +1,137 @@
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.utils.class_weight import compute_class_weight
+from sklearn.utils.validation import check_is_fitted
+
+
+class ApproxSVC(ClassifierMixin, BaseEstimator):
+    """A linear SVM trained on random features that approximate a kernel, i.e., an alternative to
+    :class:`~sklearn.svm.SVC` whose training time grows linearly, rather than quadratically or worse, with the number
+    of pairs.
+
+    The kernel is approximated either by a Nystroem sample of the training pairs, for the *rbf*, *sigmoid* and *poly*
+    kernels, or by random Fourier features for the *rbf* one. The linear SVM is fit by stochastic gradient descent on
+    the hinge loss, whereas probabilities are calibrated by a logistic regression on its decision values over the
+    training pairs, i.e., without the internal cross-validation of ``SVC(probability=True)``.
+
+    Parameters
+    ----------
+    kernel: str
+        The approximated kernel (*rbf* | *sigmoid* | *poly*).
+    gamma: float
+        Coefficient of the kernel.
+    C: float
+        Inverse of the regularization strength, as in :class:`~sklearn.svm.SVC`.
+    n_components: int
+        Number of random features, i.e., the quality of the approximation against time and memory.
+    approximation: str
+        The approximation of the kernel (*nystroem* | *rff*). *rff* supports only the *rbf* kernel.
+    class_weight: dict or 'balanced', optional
+        Weights of the classes, as in :class:`~sklearn.svm.SVC`.
+    max_iter: int
+        Maximum number of passes over the training pairs.
+    tol: float
+        The stopping criterion of the passes.
+    random_state: int, optional
+        Seed of the random features and of the shuffling of pairs.
+    """
+    def __init__(self, kernel='rbf', gamma=0.1, C=1.0, n_components=300, approximation='nystroem', class_weight=None,
+                 max_iter=100, tol=1e-4, random_state=None):
+        self.kernel = kernel
+        self.gamma = gamma
+        self.C = C
+        self.n_components = n_components
+        self.approximation = approximation
+        self.class_weight = class_weight
+        self.max_iter = max_iter
+        self.tol = tol
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        """Fit the random features and the linear SVM on pairs ``X`` with labels ``y``."""
+        X = np.asarray(X)
+        self.classes_ = np.unique(y)
+        Z = self._random_features(X.shape[0]).fit_transform(X)
+
+        # the regularization of SVC, i.e., C summed over pairs, as the mean loss of SGD
+        self.svm_ = SGDClassifier(
+            loss='hinge', alpha=1 / (self.C * X.shape[0]), class_weight=self.class_weight, max_iter=self.max_iter,
+            tol=self.tol, random_state=self.random_state
+        ).fit(Z, y)
+        self.calibration_ = LogisticRegression().fit(self.svm_.decision_function(Z).reshape(-1, 1), y)
+
+        return self
+
+    def partial_fit(self, X, y, classes=None, n_samples=None):
+        """Update the linear SVM with one pass over a chunk of pairs ``X`` with labels ``y``, e.g., of features that do
+        not fit in memory.
+
+        The random features are fit on the first chunk, along with the weights of a *balanced* ``class_weight``,
+        whereas probabilities are calibrated on the latest chunk.
+
+        Parameters
+        ----------
+        X: array-like, shape = [n_samples, n_features]
+            The chunk of pairs.
+        y: array-like, shape = [n_samples]
+            Their labels.
+        classes: array-like, optional
+            All the classes. Required on the first call, unless its chunk has all of them.
+        n_samples: int, optional
+            The number of all the training pairs, which the regularization is summed over, as in :meth:`fit`. Defaults
+            to the pairs of the first chunk.
+
+        Returns
+        -------
+        self
+        """
+        X = np.asarray(X)
+        if not hasattr(self, 'svm_'):
+            self.classes_ = np.unique(y) if classes is None else np.asarray(classes)
+            self._random_features(X.shape[0]).fit(X)
+
+            class_weight = self.class_weight
+            if class_weight == 'balanced':
+                class_weight = dict(zip(self.classes_, compute_class_weight('balanced', classes=self.classes_, y=y)))
+            self.svm_ = SGDClassifier(
+                loss='hinge', alpha=1 / (self.C * (n_samples or X.shape[0])), class_weight=class_weight,
+                random_state=self.random_state
+            )
+
+        Z = self.features_.transform(X)
+        self.svm_.partial_fit(Z, y, classes=self.classes_)
+        if len(np.unique(y)) > 1:
+            self.calibration_ = LogisticRegression().fit(self.svm_.decision_function(Z).reshape(-1, 1), y)
+
+        return self
+
+    def _random_features(self, n_samples):
+        assert self.approximation in ['nystroem', 'rff'], f'{self.approximation} is not a supported approximation'
+        assert self.approximation == 'nystroem' or self.kernel == 'rbf', 'rff approximates only the rbf kernel'
+
+        if self.approximation == 'rff':
+            self.features_ = RBFSampler(
+                gamma=self.gamma, n_components=self.n_components, random_state=self.random_state
+            )
+        else:
+            self.features_ = Nystroem(
+                kernel=self.kernel, gamma=self.gamma, n_components=min(self.n_components, n_samples),
+                random_state=self.random_state
+            )
+
+        return self.features_
+
+    def decision_function(self, X):
+        """Return the signed distance of pairs ``X`` to the separating hyperplane."""
+        check_is_fitted(self, 'svm_')
+        return self.svm_.decision_function(self.features_.transform(np.asarray(X)))
+
+    def predict_proba(self, X):
+        """Return the calibrated probability of pairs ``X`` to belong to each of the classes."""
+        return self.calibration_.predict_proba(self.decision_function(X).reshape(-1, 1))
+
+    def predict(self, X):
+        """Return the predicted class of pairs ``X``."""
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
@@ -0,0 +1,144 @@
+import os
+import json
+from datetime import datetime
+import joblib
+import sklearn
+
+from poi_interlinking import config
+from poi_interlinking.learning.hyperparam_tuning import ParamTuning
+from poi_interlinking.learning import compiled_trees
+
+
+class ModelBundle:
+    """A trained classifier along with the fitted feature step it was trained on, i.e., a
+    :class:`~poi_interlinking.processing.transformer.PairFeatures` that holds the scalers, LGM-Sim parameters, frequent
+    terms and feature columns, so that unlabeled pairs are scored without retraining or refitting.
+
+    A bundle is stored as a folder with a *manifest.json*, the pickled feature step and one pickled model per
+    classifier, along with the compiled trees of the tree ensembles among them, see :meth:`compile`, and the first
+    stage of a cascade, if any.
+
+    Parameters
+    ----------
+    features: :class:`~poi_interlinking.processing.transformer.PairFeatures`
+        The fitted feature step.
+    models: dict
+        Maps the name of each classifier, as in :attr:`~poi_interlinking.learning.hyperparam_tuning.ParamTuning.clf_names`,
+        to its trained estimator.
+    compiled: dict, optional
+        Maps the name of each tree ensemble to its
+        :class:`~poi_interlinking.learning.compiled_trees.CompiledTrees`.
+    cascade: :class:`~poi_interlinking.learning.cascade.CascadeScorer`, optional
+        The first stage of a cascade, whose second one are the models.
+    """
+    #: int: Version of the stored layout. Bundles of other versions cannot be loaded.
+    format_version = 1
+
+    def __init__(self, features, models, compiled=None, cascade=None):
+        self.features = features
+        self.models = models
+        self.compiled = compiled if compiled is not None else dict()
+        self.cascade = cascade
+
+    def compile(self, X):
+        """Export the trees of the tree ensembles among the models, which are verified to score the training features
+        ``X`` as their models do, see :func:`~poi_interlinking.learning.compiled_trees.compile_model`.
+
+        Returns
+        -------
+        :class:`ModelBundle`
+            The bundle itself.
+        """
+        for name, model in self.models.items():
+            if not compiled_trees.supports(model): continue
+            self.compiled[name] = compiled_trees.compile_model(model, ParamTuning.model_input(X, model))
+
+        return self
+
+    def save(self, path):
+        """Store the bundle in folder ``path``."""
+        os.makedirs(path, exist_ok=True)
+
+        joblib.dump(self.features, os.path.join(path, 'features.joblib'))
+        files = dict()
+        for name, model in self.models.items():
+            files[name] = f'model_{name}.joblib'
+            joblib.dump(model, os.path.join(path, files[name]))
+        compiled = dict()
+        for name, trees in self.compiled.items():
+            compiled[name] = f'compiled_{name}.npz'
+            trees.save(os.path.join(path, compiled[name]))
+        if self.cascade is not None: joblib.dump(self.cascade, os.path.join(path, 'cascade.joblib'))
+
+        manifest = dict(
+            format_version=self.format_version,
+            created=datetime.now().isoformat(timespec='seconds'),
+            sklearn_version=sklearn.__version__,
+            encoding=self.features.encoding,
+            classification_method=self.features.state_['clf_method'],
+            feature_cols=self.features.get_feature_names_out().tolist(),
+            feature_dtype=str(self.features.dtype or config.feature_dtype),
+            models=files,
+            compiled=compiled,
+            cascade='cascade.joblib' if self.cascade is not None else None,
+        )
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        print(f'Stored model bundle of {list(files)} in {path}')
+
+    @classmethod
+    def load(cls, path):
+        """Load the bundle stored in folder ``path`` by :meth:`save`."""
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        assert manifest['format_version'] == cls.format_version, \
+            f'{path} is a bundle of version {manifest["format_version"]}, whereas {cls.format_version} is supported'
+        if manifest['sklearn_version'] != sklearn.__version__:
+            print(f'The bundle in {path} was stored with scikit-learn {manifest["sklearn_version"]}, '
+                  f'whereas {sklearn.__version__} is installed')
+
+        features = joblib.load(os.path.join(path, 'features.joblib'))
+        models = {name: joblib.load(os.path.join(path, f)) for name, f in manifest['models'].items()}
+        # bundles stored before trees were compiled have none
+        compiled = {
+            name: compiled_trees.CompiledTrees.load(os.path.join(path, f))
+            for name, f in manifest.get('compiled', {}).items()
+        }
+        cascade = joblib.load(os.path.join(path, manifest['cascade'])) if manifest.get('cascade') else None
+        assert features.get_feature_names_out().tolist() == manifest['feature_cols'], \
+            f'The feature step of {path} does not build the features of its manifest'
+
+        return cls(features, models, compiled, cascade)
+
+    def predict_proba(self, df, clf=None, compiled=False, cascade=False):
+        """Score the pairs of ``df``.
+
+        Parameters
+        ----------
+        df: :obj:`pandas.DataFrame`
+            The POI pairs, with the columns of :attr:`~poi_interlinking.config.use_cols`; labels are not required.
+        clf: str, optional
+            The classifier to use. Defaults to the first one of the bundle.
+        compiled: bool
+            Whether to score with the compiled trees of the classifier, if any, rather than with its model. They are
+            faster on small batches, whereas large ones are scored faster by the model.
+        cascade: bool
+            Whether to build all features and score with the classifier only the pairs that the first stage of the
+            cascade of the bundle is uncertain of.
+
+        Returns
+        -------
+        ndarray, shape = [n_samples, 2]
+            The probability of each pair to be a non match and a match respectively.
+        """
+        name = clf if clf is not None else next(iter(self.models))
+        if cascade:
+            assert self.cascade is not None, 'The bundle has no cascade, see the --cascade option of eval and tune'
+            return self.cascade.predict_proba(df, lambda d: self.predict_proba(d, name, compiled), name)
+
+        model = self.models[name]
+        X = ParamTuning.model_input(self.features.transform(df), model)
+        if compiled and name in self.compiled: return self.compiled[name].predict_proba(X)
+        return model.predict_proba(X)
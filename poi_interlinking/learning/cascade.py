@@ -0,0 +1,174 @@
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+from poi_interlinking import config
+from poi_interlinking.learning.hyperparam_tuning import ParamTuning
+from poi_interlinking.processing.features import Features
+from poi_interlinking.processing.pairs import PairTable
+from poi_interlinking.processing.transformer import PairFeatures
+
+
+class CascadeScorer:
+    """The first stage of a two-stage cascade, which scores all pairs on a few cheap features and decides the confident
+    ones, whereas only the pairs whose probability falls within an uncertainty band are escalated to the second stage,
+    i.e., the classifiers of a :class:`~poi_interlinking.learning.bundle.ModelBundle` on all features.
+
+    The band of each classifier is tuned on out-of-fold probabilities of the training pairs to escalate the fewest
+    pairs whose accuracy drops by at most ``max_accuracy_loss`` from the classifier on its own.
+
+    Parameters
+    ----------
+    features: list of str, optional
+        The cheap features, which should be built for the classification group of the second stage. Defaults to the
+        ones of that group in :attr:`~poi_interlinking.config.MLConf.cascade_features`.
+    classifier: str, optional
+        The classifier of the first stage, out of
+        :attr:`~poi_interlinking.learning.hyperparam_tuning.ParamTuning.clf_names`, with its hyperparameters in
+        :attr:`~poi_interlinking.config.MLConf.clf_custom_params`. Defaults to
+        :attr:`~poi_interlinking.config.MLConf.cascade_classifier`.
+    max_accuracy_loss: float, optional
+        Defaults to :attr:`~poi_interlinking.config.MLConf.cascade_max_accuracy_loss`.
+
+    Attributes
+    ----------
+    bands_: dict
+        Maps the name of each classifier of the second stage to the band, i.e., the lowest and highest probability of
+        the first stage, whose pairs it scores.
+    escalated_: dict
+        Maps the name of each classifier of the second stage to the fraction of the training pairs escalated to it.
+    """
+    def __init__(self, features=None, classifier=None, max_accuracy_loss=None):
+        self.features = features
+        self.classifier = config.MLConf.cascade_classifier if classifier is None else classifier
+        self.max_accuracy_loss = \
+            config.MLConf.cascade_max_accuracy_loss if max_accuracy_loss is None else max_accuracy_loss
+
+        # pairs scored, and escalated out of them, since loaded
+        self.scored = 0
+        self.escalated = 0
+
+    def fit(self, X, y, fX, models, encoding='latin', clf_method=None):
+        """Train the first stage on pairs ``X`` and tune its band for each one of ``models``.
+
+        Parameters
+        ----------
+        X: :obj:`pandas.DataFrame` or :class:`~poi_interlinking.processing.pairs.PairTable`
+            The training pairs.
+        y: array-like, shape = [n_samples]
+            Their labels.
+        fX: ndarray, shape = [n_samples, n_features]
+            All the features of the pairs, which the second stage is trained on.
+        models: dict
+            Maps the name of each classifier of the second stage to its estimator, which is cloned.
+        encoding: str
+            The encoding of the frequent terms, as in :class:`~poi_interlinking.processing.transformer.PairFeatures`.
+        clf_method: str, optional
+            The classification group of features of the second stage.
+
+        Returns
+        -------
+        self
+        """
+        clf_method = config.MLConf.classification_method if clf_method is None else clf_method
+        features = config.MLConf.cascade_features.get(clf_method) if self.features is None else self.features
+        assert features is not None, f'No cascade features are configured for the {clf_method} group'
+
+        f = Features()
+        f.clf_method = clf_method
+        unknown = [c for c in features if c not in f.feature_cols()]
+        assert not unknown, f'The cascade features {unknown} are not built for the {clf_method} group; choose ' \
+                            f'among {f.feature_cols()} in MLConf.cascade_features'
+
+        self.features_ = PairFeatures(clf_method=clf_method, encoding=encoding, selected_features=features)
+        cheap_fX = self.features_.fit_transform(X)
+
+        model = ParamTuning.clf_names[self.classifier][0](**config.MLConf.clf_custom_params[self.classifier])
+        cv = StratifiedKFold(n_splits=config.MLConf.kfold_inner_parameter, shuffle=True, random_state=config.seed_no)
+        cheap = self._out_of_fold(model, cheap_fX, y, cv)
+
+        self.bands_, self.escalated_ = dict(), dict()
+        for name, estimator in models.items():
+            full = self._out_of_fold(estimator, fX, y, cv)
+            self.bands_[name], self.escalated_[name], accuracy = _tune_band(cheap, full, y, self.max_accuracy_loss)
+            print(f'The cascade escalates {self.escalated_[name]:.2%} of the training pairs to {name}, whose '
+                  f'probability by {self.classifier} on {len(features)} features falls within '
+                  f'[{self.bands_[name][0]:.4f}, {self.bands_[name][1]:.4f}]; accuracy {accuracy[1]:.4f} against '
+                  f'{accuracy[0]:.4f} of {name} on its own')
+
+        self.model_ = model.fit(ParamTuning.model_input(cheap_fX, model), y)
+        return self
+
+    @staticmethod
+    def _out_of_fold(estimator, fX, y, cv):
+        estimator = clone(estimator)
+        proba = cross_val_predict(estimator, ParamTuning.model_input(fX, estimator), y, cv=cv, method='predict_proba')
+        return proba[:, 1]
+
+    def predict_proba(self, X, full, clf):
+        """Score pairs ``X`` with the first stage and the escalated ones with ``full``.
+
+        Parameters
+        ----------
+        X: :obj:`pandas.DataFrame` or :class:`~poi_interlinking.processing.pairs.PairTable`
+            The POI pairs.
+        full: callable
+            Returns the probabilities of the second stage for a subset of ``X``.
+        clf: str
+            The classifier of the second stage, whose band is used.
+
+        Returns
+        -------
+        ndarray, shape = [n_samples, 2]
+        """
+        proba = self.model_.predict_proba(ParamTuning.model_input(self.features_.transform(X), self.model_))
+
+        low, high = self.bands_[clf]
+        idxs = np.flatnonzero((proba[:, 1] >= low) & (proba[:, 1] <= high))
+        if len(idxs): proba[idxs] = full(X.take(idxs) if isinstance(X, PairTable) else X.iloc[idxs])
+
+        self.scored += len(proba)
+        self.escalated += len(idxs)
+        return proba
+
+
+def _tune_band(cheap, full, y, max_loss):
+    """Find the band of the probabilities ``cheap`` that escalates the fewest pairs to ``full`` while the accuracy
+    drops by at most ``max_loss``.
+
+    Returns
+    -------
+    band: tuple of (float, float)
+    escalated: float
+        The fraction of the pairs within the band.
+    accuracy: tuple of (float, float)
+        The accuracy of ``full`` and of the cascade.
+    """
+    y = np.asarray(y).astype(bool)
+    err_cheap = (cheap >= 0.5) != y
+    err_full = (full >= 0.5) != y
+
+    # the confident pairs lie below the lower bound, which decides non matches, or above the upper one
+    order = np.argsort(cheap)
+    p = cheap[order]
+    cuts = np.unique(np.r_[np.quantile(p, np.linspace(0, 1, 201)), 0.5])
+    lows, highs = cuts[cuts <= 0.5], cuts[cuts >= 0.5]
+
+    def below(err, bounds):
+        return np.r_[0, np.cumsum(err[order])][np.searchsorted(p, bounds, side='left')]
+
+    def above(err, bounds):
+        return np.r_[0, np.cumsum(err[order][::-1])][len(p) - np.searchsorted(p, bounds, side='right')]
+
+    ones = np.ones(len(p))
+    confident = below(ones, lows)[:, None] + above(ones, highs)[None, :]
+    # the errors of the cascade are the ones of the classifier, except for the confident pairs
+    errors = err_full.sum() + (below(err_cheap, lows) - below(err_full, lows))[:, None] + \
+        (above(err_cheap, highs) - above(err_full, highs))[None, :]
+
+    feasible = (errors - err_full.sum()) <= max_loss * len(p)
+    # the band with the most confident pairs, and fewest errors among them
+    score = np.where(feasible, confident * (len(p) + 1) - errors, -np.inf)
+    i, j = np.unravel_index(np.argmax(score), score.shape)
+
+    return (lows[i], highs[j]), 1 - confident[i, j] / len(p), (1 - err_full.mean(), 1 - errors[i, j] / len(p))
@@ -0,0 +1,123 @@
+import numpy as np
+from sklearn.base import clone
+from sklearn.inspection import permutation_importance
+from sklearn.metrics import get_scorer
+
+from poi_interlinking import config
+
+
+def feature_importances(estimator, X, y):
+    """Return the importance of each feature for a trained ``estimator``.
+
+    The importances are taken from the *feature_importances_* or *coef_* attributes of the estimator, whenever
+    available, otherwise they are computed with permutation importance on (X, y).
+
+    Parameters
+    ----------
+    estimator: classifier object
+        A trained classifier.
+    X: array-like, shape = [n_samples, n_features]
+        The samples to compute the permutation importance on.
+    y: array-like, shape = [n_samples]
+        The target values, i.e. class labels.
+
+    Returns
+    -------
+    ndarray of float, shape = [n_features]
+        The importance of each feature.
+    """
+    if hasattr(estimator, 'feature_importances_'):
+        return np.asarray(estimator.feature_importances_, dtype=float)
+    if hasattr(estimator, 'coef_'):
+        return np.abs(np.asarray(estimator.coef_, dtype=float)).ravel()
+
+    return permutation_importance(
+        estimator, X, y, scoring=config.MLConf.score, random_state=config.seed_no, n_jobs=config.MLConf.n_jobs
+    ).importances_mean.clip(min=0)
+
+
+def select_features(estimator, X_train, y_train, X_val, y_val, costs, max_loss=None, max_latency=None):
+    """Select the cheapest subset of features whose score stays within ``max_loss`` of the score on all features.
+
+    Features are ranked by their importance per compute cost and the estimator is retrained on increasingly larger
+    prefixes of this ranking. The first prefix that scores within ``max_loss`` is selected. Prefixes whose cost exceeds
+    ``max_latency`` are not considered; if no prefix within the latency budget satisfies ``max_loss``, the best scoring
+    one is selected.
+
+    Parameters
+    ----------
+    estimator: classifier object
+        An instance of a classifier, that is fitted on each examined subset of features.
+    X_train, y_train: array-like
+        The samples and labels to train the estimator on.
+    X_val, y_val: array-like
+        The samples and labels to evaluate each subset of features on.
+    costs: array-like of float, shape = [n_features]
+        The compute cost of each feature.
+    max_loss: float, optional
+        Max allowed drop of :attr:`~poi_interlinking.config.MLConf.score`. Defaults to
+        :attr:`~poi_interlinking.config.MLConf.feature_selection_max_loss`.
+    max_latency: float, optional
+        Max allowed total cost of the selected features. Defaults to
+        :attr:`~poi_interlinking.config.MLConf.feature_selection_max_latency`.
+
+    Returns
+    -------
+    :obj:`dict`
+        The mask of *selected* features along with the *importances*, *score* and *cost* of the selected subset and
+        the *full_score* and *full_cost* when all features are used.
+
+    Raises
+    ------
+    ValueError
+        If even the top-ranked feature costs more than ``max_latency``.
+    """
+    max_loss = config.MLConf.feature_selection_max_loss if max_loss is None else max_loss
+    max_latency = config.MLConf.feature_selection_max_latency if max_latency is None else max_latency
+    scorer = get_scorer(config.MLConf.score)
+    costs = np.asarray(costs, dtype=float)
+
+    model = _fit(estimator, X_train, y_train)
+    full_score = scorer(model, X_val, y_val)
+    importances = feature_importances(model, X_val, y_val)
+
+    ranking = np.argsort(-importances / np.maximum(costs, np.finfo(float).tiny), kind='stable')
+
+    best = None
+    for k in range(1, len(ranking) + 1):
+        subset = ranking[:k]
+        cost = costs[subset].sum()
+        if max_latency is not None and cost > max_latency: break
+
+        score = scorer(_fit(estimator, X_train[:, subset], y_train), X_val[:, subset], y_val)
+        if best is None or score > best['score']: best = dict(subset=subset, score=score, cost=cost)
+        print(f'Top {k} features by importance per cost: score {score:.4f}, cost {cost * 1000:.4f} ms per pair')
+
+        if score >= full_score - max_loss:
+            best = dict(subset=subset, score=score, cost=cost)
+            break
+
+    if best is None:
+        raise ValueError(
+            f'The top-ranked feature costs {costs[ranking[0]] * 1000:.4f} ms per pair, i.e., no features fit within '
+            f'the max latency of {max_latency * 1000:.4f} ms; raise MLConf.feature_selection_max_latency'
+        )
+
+    selected = np.zeros(len(costs), dtype=bool)
+    selected[best['subset']] = True
+
+    return dict(
+        selected=selected, importances=importances, score=best['score'], cost=costs[selected].sum(),
+        full_score=full_score, full_cost=costs.sum()
+    )
+
+
+def _fit(estimator, X, y):
+    model = clone(estimator)
+
+    # integer max_features cannot exceed the number of features
+    max_features = model.get_params().get('max_features')
+    if isinstance(max_features, int) and max_features > X.shape[1]:
+        model.set_params(max_features=X.shape[1])
+
+    return model.fit(X, y)
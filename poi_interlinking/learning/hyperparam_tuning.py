@@ -1,18 +1,25 @@
 # Author: vkaff
 # E-mail: vkaffes@imis.athena-innovation.gr
 
-from poi_interlinking import config
+import time
+from poi_interlinking import config, helpers
 import numpy as np
+from joblib import effective_n_jobs
+from scipy.stats import randint, uniform, rv_discrete
 
 from sklearn.svm import SVC
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
 from xgboost import XGBClassifier
 from sklearn.neural_network import MLPClassifier
-from sklearn.model_selection import GridSearchCV, RandomizedSearchCV
+from sklearn.model_selection import ParameterGrid, ParameterSampler
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, balanced_accuracy_score, roc_auc_score
 from sklearn.model_selection import StratifiedKFold
 
+from poi_interlinking.learning import out_of_core
+from poi_interlinking.learning.approx_svm import ApproxSVC
+from poi_interlinking.learning.trials import TrialSearch
+
 
 np.random.seed(config.seed_no)
 
@@ -28,6 +35,8 @@ class ParamTuning:
     * Random Forest
     * Extra-Trees
     * eXtreme Gradient Boosting (XGBoost)
+    * SVM on random features that approximate its kernel (ApproxSVM), see
+      :class:`~poi_interlinking.learning.approx_svm.ApproxSVC`
     """
     clf_names = {
         'SVM': [SVC, config.MLConf.SVM_hyperparameters, config.MLConf.SVM_hyperparameters_dist],
@@ -38,9 +47,14 @@ class ParamTuning:
                          config.MLConf.RandomForest_hyperparameters_dist],
         'ExtraTrees': [ExtraTreesClassifier, config.MLConf.RandomForest_hyperparameters,
                         config.MLConf.RandomForest_hyperparameters_dist],
-        'XGBoost': [XGBClassifier, config.MLConf.XGBoost_hyperparameters, config.MLConf.XGBoost_hyperparameters_dist]
+        'XGBoost': [XGBClassifier, config.MLConf.XGBoost_hyperparameters, config.MLConf.XGBoost_hyperparameters_dist],
+        'ApproxSVM': [ApproxSVC, config.MLConf.ApproxSVM_hyperparameters, config.MLConf.ApproxSVM_hyperparameters_dist],
     }
 
+    #: tuple: Classifiers that are trained on quantized features as is, since their splits are invariant to the scale of
+    #: features.
+    scale_invariant = (DecisionTreeClassifier, RandomForestClassifier, ExtraTreesClassifier, XGBClassifier)
+
     def __init__(self):
         # To be used in outer CV
         self.outer_cv = StratifiedKFold(n_splits=max(config.MLConf.kfold_no, 5), shuffle=False)
@@ -51,7 +65,7 @@ class ParamTuning:
         self.search_method = config.MLConf.hyperparams_search_method
         self.n_iter = config.MLConf.max_iter
 
-    def fineTuneClassifiers(self, X, y):
+    def fineTuneClassifiers(self, X, y, trials=None):
         """Search over specified parameter values for various estimators/classifiers and choose the best one.
 
         This method searches over specified values and selects the classifier that
@@ -65,6 +79,7 @@ class ParamTuning:
          * :attr:`~poi_interlinking.config.MLConf.XGBoost_hyperparameters`
          * :attr:`~poi_interlinking.config.MLConf.SVM_hyperparameters`
          * :attr:`~poi_interlinking.config.MLConf.DecisionTree_hyperparameters`
+         * :attr:`~poi_interlinking.config.MLConf.ApproxSVM_hyperparameters`
 
         * *RandomizedSearchCV*: Randomized search over continuous distribution space. :attr:`~poi_interlinking.config.MLConf.max_iter`
           defines the number of parameter settings that are sampled. :py:attr:`~poi_interlinking.config.MLConf.max_iter` trades off
@@ -75,6 +90,26 @@ class ParamTuning:
          * :attr:`~poi_interlinking.config.MLConf.XGBoost_hyperparameters_dist`
          * :attr:`~poi_interlinking.config.MLConf.SVM_hyperparameters_dist`
          * :attr:`~poi_interlinking.config.MLConf.DecisionTree_hyperparameters_dist`
+         * :attr:`~poi_interlinking.config.MLConf.ApproxSVM_hyperparameters_dist`
+
+        * *Successive halving*: Randomized search over the same distributions as *RandomizedSearchCV*, where all
+          :attr:`~poi_interlinking.config.MLConf.max_iter` candidates are evaluated on a small budget, i.e., the
+          ``n_estimators`` or ``max_iter`` of :attr:`~poi_interlinking.config.MLConf.halving_resources` or else the
+          number of train samples, and only the best :attr:`~poi_interlinking.config.MLConf.halving_factor`-th of them
+          is promoted to a larger budget per round. The time saved compared with *RandomizedSearchCV* is reported.
+
+        * *Warm-started*: Randomized search seeded with the previous best hyperparameters, i.e.,
+          :attr:`~poi_interlinking.config.MLConf.clf_custom_params`, as the first candidate, whereas the rest are
+          sampled around them, see :attr:`~poi_interlinking.config.MLConf.warm_start_width`. The search stops once the
+          best score does not improve over :attr:`~poi_interlinking.config.MLConf.warm_start_patience` candidates in a
+          row, or else after :attr:`~poi_interlinking.config.MLConf.max_iter` ones.
+
+        The candidates are evaluated by :class:`~poi_interlinking.learning.trials.TrialSearch`, i.e., the score of each
+        one on each fold is appended to ``trials`` as soon as it is computed, whereas trials already in ``trials`` are
+        not evaluated again. Randomized candidates are sampled with :attr:`~poi_interlinking.config.seed_no`, so that a
+        restarted search samples the same ones. XGBoost candidates are trained on quantized data that is built once
+        per fold and early stopped on a held-out split of it, see
+        :attr:`~poi_interlinking.config.MLConf.xgb_early_stopping_rounds`.
 
         Parameters
         ----------
@@ -82,6 +117,8 @@ class ParamTuning:
             The training input samples.
         y: array-like, shape = [n_samples] or [n_samples, n_outputs]
             The target values, i.e. class labels.
+        trials: :class:`~poi_interlinking.learning.trials.TrialLog`, optional
+            The log of evaluated trials to resume from and append to. None disables logging.
 
         Returns
         -------
@@ -94,20 +131,11 @@ class ParamTuning:
         for clf_key in config.MLConf.classifiers:
             try:
                 clf = None
-                fit_params = {}
-                if clf_key == 'XGBoost':
-                    X_test = X
-                    y_test = y
-                    fit_params = {
-                        "early_stopping_rounds": 30,
-                        "eval_metric": "mae",
-                        "eval_set": [[X_test, y_test]],
-                        "verbose": 0
-                    }
+                X_clf = self.model_input(X, self.clf_names[clf_key][0]())
                 if self.search_method.lower() == 'grid':
-                    clf = GridSearchCV(
-                        self.clf_names[clf_key][0](), self.clf_names[clf_key][1],
-                        cv=self.outer_cv, scoring=config.MLConf.score, verbose=1, n_jobs=self.n_jobs
+                    clf = TrialSearch(
+                        self.clf_names[clf_key][0](), list(ParameterGrid(self.clf_names[clf_key][1])),
+                        cv=self.outer_cv, name=clf_key, trials=trials, n_jobs=self.n_jobs, **self._boosting(clf_key)
                     )
                 # elif self.search_method.lower() == 'hyperband' and clf_key in ['XGBoost', 'Extra-Trees', 'Random Forest']:
                 #     HyperbandSearchCV(
@@ -117,12 +145,20 @@ class ParamTuning:
                 #         max_iter=3000 if clf_key == 'XGBoost' else 1000,
                 #         cv=self.inner_cv, random_state=seed_no, scoring=score
                 #     )
+                elif self.search_method.lower() == 'halving':
+                    clf = self._halving_search(clf_key, trials)
+                elif self.search_method.lower() == 'warm':
+                    clf = self._warm_start_search(clf_key, trials)
                 else:  # randomized is used as default
-                    clf = RandomizedSearchCV(
-                        self.clf_names[clf_key][0](), self.clf_names[clf_key][2],
-                        cv=self.outer_cv, scoring=config.MLConf.score, verbose=1, n_jobs=self.n_jobs, n_iter=self.n_iter
+                    clf = TrialSearch(
+                        self.clf_names[clf_key][0](), self._sample_candidates(self.clf_names[clf_key][2]),
+                        cv=self.outer_cv, name=clf_key, trials=trials, n_jobs=self.n_jobs, **self._boosting(clf_key)
                     )
-                clf.fit(X, y, **fit_params)
+                start_time = time.time()
+                clf.fit(X_clf, y)
+                search_time = time.time() - start_time
+                if self.search_method.lower() == 'halving':
+                    self._report_halving(clf_key, clf, search_time, X_clf, y)
 
                 hyperparams_found = dict()
                 hyperparams_found['score'] = clf.best_score_
@@ -131,6 +167,7 @@ class ParamTuning:
                 hyperparams_found['estimator'] = clf.best_estimator_
                 hyperparams_found['classifier'] = clf_key
                 hyperparams_found['scorers'] = clf.scorer_
+                hyperparams_found['search_time'] = search_time
                 if hasattr(clf.best_estimator_, 'feature_importances_'):
                     hyperparams_found['importances'] = clf.best_estimator_.feature_importances_
                 elif hasattr(clf.best_estimator_, 'coef_'):
@@ -149,9 +186,102 @@ class ParamTuning:
 
         return best_clf
 
-    def trainClassifier(self, X_train, y_train, model):
+    @staticmethod
+    def _boosting(clf_key):
+        # XGBoost candidates are early stopped on quantized data that is shared among them
+        if clf_key != 'XGBoost': return dict()
+        return dict(early_stopping_rounds=config.MLConf.xgb_early_stopping_rounds)
+
+    def _sample_candidates(self, params):
+        return list(ParameterSampler(params, self.n_iter, random_state=config.seed_no))
+
+    def _warm_start_search(self, clf_key, trials=None):
+        dists = self.clf_names[clf_key][2]
+        custom = config.MLConf.clf_custom_params.get(clf_key, {})
+        # candidates are sampled on top of the previous best configuration, which is the first one, i.e., its
+        # hyperparameters out of the search space, e.g., random_state, are kept too
+        seed = {k: v for k, v in custom.items() if k in dists}
+        narrowed = {
+            k: self._narrow(dist, seed[k], config.MLConf.warm_start_width) if k in seed else dist
+            for k, dist in dists.items()
+        }
+
+        return TrialSearch(
+            self.clf_names[clf_key][0](**custom), [seed] + self._sample_candidates(narrowed)[:self.n_iter - 1],
+            cv=self.outer_cv, name=clf_key, trials=trials, n_jobs=self.n_jobs,
+            patience=config.MLConf.warm_start_patience, tol=config.MLConf.warm_start_tol, **self._boosting(clf_key)
+        )
+
+    @staticmethod
+    def _narrow(dist, value, width):
+        """Return a distribution of hyperparameter values around ``value`` in place of ``dist``.
+
+        Numeric values of a scipy distribution are sampled uniformly within ``width`` of ``value``, bounded by the
+        support of ``dist``, whereas ``value`` is picked half of the time out of a list of values.
+        """
+        if not hasattr(dist, 'rvs'): return [value] * len(dist) + [v for v in dist if v != value]
+
+        low, high = dist.support()
+        center = min(max(value, low), high)
+        low, high = max(center * (1 - width), low), min(center * (1 + width), high)
+        if isinstance(dist.dist, rv_discrete): return randint(int(np.floor(low)), int(np.ceil(high)) + 1)
+        return uniform(low, high - low)
+
+    def _halving_search(self, clf_key, trials=None):
+        params = dict(self.clf_names[clf_key][2])
+        budget = dict(resource='n_samples')
+        if clf_key in config.MLConf.halving_resources:
+            resource, min_resources, max_resources = config.MLConf.halving_resources[clf_key]
+            # the budget parameter is set by the search itself
+            params.pop(resource, None)
+            budget = dict(resource=resource, min_resources=min_resources, max_resources=max_resources)
+
+        return TrialSearch(
+            self.clf_names[clf_key][0](), self._sample_candidates(params), cv=self.outer_cv, name=clf_key,
+            trials=trials, n_jobs=self.n_jobs, factor=config.MLConf.halving_factor, **budget,
+            **self._boosting(clf_key)
+        )
+
+    def _report_halving(self, clf_key, search, search_time, X, y):
+        """Print the time successive halving ``search`` saved compared with randomized search on as many candidates.
+
+        The time of randomized search is measured if :attr:`~poi_interlinking.config.MLConf.halving_compare_randomized`
+        is enabled. Otherwise, it is estimated by the mean fit and score time of the candidates of the last round, per
+        unit of budget, at the mean budget of randomized search.
+        """
+        if config.MLConf.halving_compare_randomized:
+            randomized = TrialSearch(
+                self.clf_names[clf_key][0](), self._sample_candidates(self.clf_names[clf_key][2]),
+                cv=self.outer_cv, name=clf_key, n_jobs=self.n_jobs, **self._boosting(clf_key)
+            )
+            start_time = time.time()
+            randomized.fit(X, y)
+            randomized_time = time.time() - start_time
+            baseline = f'randomized search took {randomized_time:.2f} sec. to score {randomized.best_score_:.4f}'
+        else:
+            res = search.cv_results_
+            last = np.asarray(res['iter']) == search.n_iterations_ - 1
+            n_resources = np.asarray(res['n_resources'])[last]
+            per_budget = (res['mean_fit_time'][last] + res['mean_score_time'][last]) / n_resources
+            # the mean budget that randomized search samples, e.g., n_estimators, or else all of the train samples
+            dist = self.clf_names[clf_key][2].get(search.resource)
+            budget = search.max_resources_ if dist is None else dist.mean() if hasattr(dist, 'mean') else np.mean(dist)
+            randomized_time = np.mean(per_budget) * budget * self.n_iter * search.n_splits_ / \
+                effective_n_jobs(self.n_jobs)
+            baseline = f'randomized search is estimated to take {randomized_time:.2f} sec.'
+
+        print(f'{clf_key}: successive halving scored {search.best_score_:.4f} in {search_time:.2f} sec. over '
+              f'{search.n_iterations_} rounds with budgets {search.n_resources_} of {search.resource}, whereas '
+              f'{baseline} on {self.n_iter} candidates, i.e., halving took {search_time / randomized_time:.1%} of its '
+              f'time.')
+
+    def trainClassifier(self, X_train, y_train, model, n_jobs=None, idxs=None):
         """Build a classifier from the training set (X_train, y_train).
 
+        If ``idxs`` is given and ``X_train`` exceeds :attr:`~poi_interlinking.config.MLConf.out_of_core_threshold`,
+        classifiers that support it are trained out of core, i.e., on chunks of the ``idxs`` rows of ``X_train``, see
+        :func:`~poi_interlinking.learning.out_of_core.fit_chunks`, whereas the rest on their materialized rows.
+
         Parameters
         ----------
         X_train: array-like or sparse matrix, shape = [n_samples, n_features]
@@ -160,20 +290,49 @@ class ParamTuning:
             The target values, i.e. class labels.
         model: classifier object
             An instance of a classifier.
+        n_jobs: int, optional
+            Number of parallel jobs of classifiers that support them. Defaults to
+            :attr:`~poi_interlinking.config.MLConf.n_jobs`.
+        idxs: array-like, optional
+            The rows of ``X_train`` and ``y_train`` to train on, e.g., of a memory-mapped feature matrix. Defaults to
+            all of them.
 
         Returns
         -------
         classifier object
             It returns a trained classifier.
         """
-        if hasattr(model, "n_jobs"): model.set_params(n_jobs=config.MLConf.n_jobs)
-
-        model.fit(X_train, y_train)
+        n_jobs = config.MLConf.n_jobs if n_jobs is None else n_jobs
+        if hasattr(model, "n_jobs"): model.set_params(n_jobs=n_jobs)
+        if 'nthread' in model.get_params(): model.set_params(nthread=n_jobs)
+
+        if idxs is not None:
+            if out_of_core.exceeds(X_train):
+                if out_of_core.supports(model):
+                    return out_of_core.fit_chunks(model, X_train, y_train, idxs, self.model_input, n_jobs)
+                print(f'{type(model).__name__} cannot be trained out of core; its {len(idxs)} training rows are '
+                      f'loaded in memory.')
+            X_train, y_train = X_train[idxs], np.asarray(y_train)[idxs]
+
+        model.fit(self.model_input(X_train, model), y_train)
         return model
 
-    def testClassifier(self, X_test, y_test, model):
+    @classmethod
+    def model_input(cls, X, model):
+        """Return the features ``X`` as input to ``model``.
+
+        Features quantized by :func:`~poi_interlinking.helpers.to_feature_dtype` are dequantized, unless ``model`` is
+        one of the :attr:`scale_invariant` classifiers.
+        """
+        if isinstance(model, cls.scale_invariant): return X
+        return helpers.dequantize(X)
+
+    def testClassifier(self, X_test, y_test, model, idxs=None):
         """Evaluate a classifier on a testing set (X_test, y_test).
 
+        If ``idxs`` is given, the classifier is tested on those rows, which are predicted in chunks when ``X_test``
+        exceeds :attr:`~poi_interlinking.config.MLConf.out_of_core_threshold`.
+
         Parameters
         ----------
         X_test: array-like or sparse matrix, shape = [n_samples, n_features]
@@ -182,6 +341,8 @@ class ParamTuning:
             The target values, i.e. class labels.
         model: classifier object
             A trained classifier.
+        idxs: array-like, optional
+            The rows of ``X_test`` and ``y_test`` to test on. Defaults to all of them.
 
         Returns
         -------
@@ -189,7 +350,14 @@ class ParamTuning:
             Returns the computed metrics, i.e., *accuracy*, *precision*, *recall* and *f1*, for the specified model on the test
             dataset.
         """
-        y_pred = model.predict(X_test)
+        if idxs is not None:
+            y_test = np.asarray(y_test)[idxs]
+            if out_of_core.exceeds(X_test):
+                y_pred = out_of_core.predict_chunks(model, X_test, idxs, self.model_input)[1]
+            else:
+                y_pred = model.predict(self.model_input(X_test[idxs], model))
+        else:
+            y_pred = model.predict(self.model_input(X_test, model))
 
         metrics = dict()
         # acc = accuracy_score(y_test, y_pred)
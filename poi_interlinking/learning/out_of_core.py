@@ -0,0 +1,139 @@
+"""Training and prediction of classifiers on chunks of rows of a feature matrix, e.g., a memory-mapped one, so that
+only a chunk of it is materialized in memory at a time.
+
+Classifiers that learn incrementally, i.e., MLP with the *sgd* or *adam* solver and
+:class:`~poi_interlinking.learning.approx_svm.ApproxSVC`, are trained by ``partial_fit`` on shuffled chunks over
+several passes, whereas XGBoost is trained on an external-memory matrix that it builds from the chunks. The rest of the
+classifiers cannot learn incrementally.
+"""
+import os
+import tempfile
+import numpy as np
+import xgboost as xgb
+
+from poi_interlinking import config
+from poi_interlinking.learning.approx_svm import ApproxSVC
+
+
+def exceeds(X):
+    """Return whether the feature matrix ``X`` is larger than
+    :attr:`~poi_interlinking.config.MLConf.out_of_core_threshold`."""
+    threshold = config.MLConf.out_of_core_threshold
+    return threshold is not None and X.nbytes > threshold
+
+
+def supports(model):
+    """Return whether ``model`` can be trained on chunks by :func:`fit_chunks`."""
+    return hasattr(model, 'get_booster') or hasattr(model, 'partial_fit')
+
+
+def chunks(idxs, random_state=None):
+    """Split the rows ``idxs`` into chunks of :attr:`~poi_interlinking.config.MLConf.out_of_core_chunk_size` rows in
+    their order, or, if ``random_state`` is given, shuffled into chunks whose rows are sorted so that they are read
+    sequentially."""
+    idxs = np.asarray(idxs)
+    size = config.MLConf.out_of_core_chunk_size
+    if random_state is None: return [idxs[i:i + size] for i in range(0, len(idxs), size)]
+
+    idxs = random_state.permutation(idxs)
+    return [np.sort(idxs[i:i + size]) for i in range(0, len(idxs), size)]
+
+
+def fit_chunks(model, X, y, idxs, transform=None, n_jobs=None):
+    """Train ``model`` on the ``idxs`` rows of ``X`` with labels ``y``, one chunk of rows at a time.
+
+    Parameters
+    ----------
+    model: classifier object
+        A classifier that :func:`supports` training on chunks.
+    X: array-like, shape = [n_samples, n_features]
+        All the features, e.g., a memory-mapped array.
+    y: array-like, shape = [n_samples]
+        All the labels.
+    idxs: array-like
+        The training rows.
+    transform: callable, optional
+        Returns the input of ``model`` for a chunk of ``X`` and ``model``, e.g.,
+        :meth:`~poi_interlinking.learning.hyperparam_tuning.ParamTuning.model_input`.
+    n_jobs: int, optional
+        Number of threads of XGBoost.
+
+    Returns
+    -------
+    classifier object
+        The trained ``model``.
+    """
+    if transform is None: transform = _as_is
+    y = np.asarray(y)
+
+    if hasattr(model, 'get_booster'): return _fit_xgboost(model, X, y, idxs, transform, n_jobs)
+
+    classes = np.unique(y[idxs])
+    # the regularization of ApproxSVC is summed over all the training rows rather than a chunk
+    kwargs = dict(n_samples=len(idxs)) if isinstance(model, ApproxSVC) else dict()
+    random_state = np.random.RandomState(config.seed_no)
+    for _ in range(config.MLConf.out_of_core_epochs):
+        for c in chunks(idxs, random_state):
+            model.partial_fit(transform(X[c], model), y[c], classes=classes, **kwargs)
+
+    return model
+
+
+def predict_chunks(model, X, idxs, transform=None):
+    """Return the probabilities and classes that ``model`` predicts for the ``idxs`` rows of ``X``, one chunk of rows
+    at a time.
+
+    Returns
+    -------
+    tuple of (ndarray, ndarray)
+    """
+    if transform is None: transform = _as_is
+
+    proba, pred = [], []
+    for c in chunks(idxs):
+        p = model.predict_proba(transform(X[c], model))
+        proba.append(p)
+        pred.append(model.classes_[np.argmax(p, axis=1)])
+
+    return np.concatenate(proba), np.concatenate(pred)
+
+
+def _as_is(X, model):
+    return X
+
+
+class _ChunkIter(xgb.DataIter):
+    """Feeds XGBoost the chunks of rows of a feature matrix, which it caches in ``cache_prefix``."""
+    def __init__(self, X, y, idxs, transform, model, cache_prefix):
+        self.X, self.y, self.transform, self.model = X, y, transform, model
+        self._chunks = chunks(idxs)
+        self._it = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._it == len(self._chunks): return False
+
+        c = self._chunks[self._it]
+        input_data(data=self.transform(self.X[c], self.model), label=self.y[c])
+        self._it += 1
+        return True
+
+    def reset(self):
+        self._it = 0
+
+
+def _fit_xgboost(model, X, y, idxs, transform, n_jobs):
+    n_jobs = config.MLConf.n_jobs if n_jobs is None else n_jobs
+    params = {k: v for k, v in model.get_xgb_params().items() if v is not None and k != 'n_jobs'}
+    params.update(tree_method='hist', nthread=n_jobs)
+
+    with tempfile.TemporaryDirectory() as cache:
+        it = _ChunkIter(X, y, idxs, transform, model, cache_prefix=os.path.join(cache, 'cache'))
+        # the quantized external-memory matrix of recent versions, or else the paged one
+        dm = xgb.ExtMemQuantileDMatrix(it, nthread=n_jobs) if hasattr(xgb, 'ExtMemQuantileDMatrix') else xgb.DMatrix(it)
+        booster = xgb.train(params, dm, num_boost_round=model.get_num_boosting_rounds())
+        del dm
+
+    # the trained booster is loaded into the estimator, e.g., for its classes and feature importances
+    model.load_model(bytearray(booster.save_raw('json')))
+    return model
@@ -1,15 +1,15 @@
 import os
 import time
-import pandas as pd
 import numpy as np
 from sklearn.metrics import accuracy_score
 import itertools
 
 from poi_interlinking import config, helpers
 from poi_interlinking.processing import sim_measures
+from poi_interlinking.misc import readers, writers
 
 
-def learn_thres(fname, sim_group='basic'):
+def learn_thres(fname, sim_group='basic', out=None):
     """Learn optimal thresholds of supported similarity metrics on achieving highest accuracy on input data.
 
     Parameters
@@ -18,6 +18,9 @@ def learn_thres(fname, sim_group='basic'):
         Input filename to search for optimal thresholds.
     sim_group : str
         The group of metrics to search for optimal thresholds. This applies to all groups except for ``lgm``.
+    out : str, optional
+        The JSON file to write the optimal threshold of each metric to, see
+        :func:`~poi_interlinking.misc.writers.write_sim_params`. Defaults to *sim_params_<sim_group>.json*.
 
     See Also
     --------
@@ -31,8 +34,7 @@ def learn_thres(fname, sim_group='basic'):
 
     start_time = time.time()
 
-    data_df = pd.read_csv(os.path.join(config.default_data_path, fname), sep=config.delimiter, names=config.fieldnames,
-                          na_filter=False, encoding='utf8')
+    data_df = readers.read_pairs(os.path.join(config.default_data_path, fname), ['s1', 's2', 'status'])
     print(f'The train data loaded in {(time.time() - start_time):.2f} sec.')
 
     sim_res = None
@@ -66,15 +68,22 @@ def learn_thres(fname, sim_group='basic'):
 
     print('\nThe process took {0:.2f} sec\n'.format(time.time() - start_time))
 
+    metrics = dict()
     for key, val in res.items():
         if len(val) == 0:
             print('{0} is empty'.format(key))
             continue
 
         print(key, max(val, key=lambda x: x[0]))
+        acc, thres = max(val, key=lambda x: x[0])
+        metrics[key] = dict(accuracy=acc, threshold=thres)
 
+    out = f'sim_params_{sim_group}.json' if out is None else out
+    writers.write_sim_params(out, sim_group, fname, metrics)
+    print(f'The learned thresholds are stored in {out}')
 
-def learn_params_for_lgm(fname, encoding):
+
+def learn_params_for_lgm(fname, encoding, out=None):
     """Learn optimal thresholds and weights for the ``lgm`` group of similarity metrics on achieving highest accuracy
     on input data.
 
@@ -84,6 +93,11 @@ def learn_params_for_lgm(fname, encoding):
         Input filename to search for optimal thresholds.
     encoding : str
         The encoding of the fname. Valid options are *latin* or *global*.
+    out : str, optional
+        The JSON file to write the optimal parameters of each metric to, see
+        :func:`~poi_interlinking.misc.writers.write_sim_params`, which the *rules* mode of
+        :meth:`~poi_interlinking.core.StrategyEvaluator.link` classifies pairs with. Defaults to
+        *sim_params_lgm_<encoding>.json*.
 
     See Also
     --------
@@ -101,8 +115,7 @@ def learn_params_for_lgm(fname, encoding):
 
     gstart_time = time.time()
 
-    data_df = pd.read_csv(os.path.join(config.default_data_path, fname), sep=config.delimiter, names=config.fieldnames,
-                          na_filter=False, encoding='utf8')
+    data_df = readers.read_pairs(os.path.join(config.default_data_path, fname), ['s1', 's2', 'status'])
     sim_measures.LGMSimVars().load_freq_terms(encoding)
 
     print(f'The train data and frequent terms loaded in {(time.time() - gstart_time):.2f} sec.')
@@ -164,6 +177,7 @@ def learn_params_for_lgm(fname, encoding):
 
     print('\nThe process took {0:.2f} sec\n'.format(time.time() - gstart_time))
 
+    metrics = dict()
     for key, val in res.items():
         if len(val) == 0:
             print('{0} is empty'.format(key))
@@ -171,6 +185,12 @@ def learn_params_for_lgm(fname, encoding):
 
         max_val = max(val, key=lambda x: x[0])
         print('{}: {}'.format(key, list(max_val)))
+        acc, thres, (split_thres, weights) = max_val
+        metrics[key] = dict(accuracy=acc, threshold=thres, split_thres=split_thres, weights=weights)
+
+    out = f'sim_params_{sim_group}_{encoding}.json' if out is None else out
+    writers.write_sim_params(out, sim_group, fname, metrics, encoding)
+    print(f'The learned parameters are stored in {out}')
 
 
 def compute_basic_similarities(a, b):
@@ -0,0 +1,81 @@
+import numpy as np
+
+from poi_interlinking import config, helpers
+from poi_interlinking.processing import sim_measures
+from poi_interlinking.processing.features import Features
+
+
+class RuleMatcher:
+    """Classifies POI pairs by the LGM-Sim scores of their names and the thresholds learned for them, i.e., without
+    building the features or training a classifier, for bulk pre-linking.
+
+    A pair matches if it scores at least the threshold of each one of :attr:`metrics`. Each score is computed with the
+    split threshold and weights learned for its metric by
+    :func:`~poi_interlinking.learning.parameters.learn_params_for_lgm`.
+
+    Parameters
+    ----------
+    params: dict
+        The learned parameters, as loaded by :func:`~poi_interlinking.misc.readers.read_sim_params`.
+    metrics: list of str, optional
+        The metrics to classify pairs with. Defaults to :attr:`~poi_interlinking.config.MLConf.rule_metrics` or, if
+        that is None, to the most accurate metric of ``params``.
+    """
+    def __init__(self, params, metrics=None):
+        assert params['sim_group'] == 'lgm', f'Rules require the parameters of the lgm group, not {params["sim_group"]}'
+
+        self.params = params
+        if metrics is None: metrics = config.MLConf.rule_metrics
+        if metrics is None: metrics = [max(params['metrics'], key=lambda m: params['metrics'][m]['accuracy'])]
+        unknown = set(metrics) - set(params['metrics'])
+        assert not unknown, f'No parameters are learned for metrics {unknown}'
+        self.metrics = metrics
+
+    def scores(self, df):
+        """Return the LGM-Sim score of each one of :attr:`metrics` for each pair of ``df``.
+
+        Parameters
+        ----------
+        df: :obj:`pandas.DataFrame`
+            The POI pairs, with the *s1* and *s2* columns of :attr:`~poi_interlinking.config.use_cols`.
+
+        Returns
+        -------
+        ndarray, shape = [n_samples, n_metrics]
+        """
+        return Features._compute_distinct(self._scores, df[config.use_cols['s1']], df[config.use_cols['s2']])
+
+    def _scores(self, s1, s2, mirrored=None):
+        a, b = helpers.transform(s1, s2, sorting=True, canonical=True)
+
+        scores = []
+        for m in self.metrics:
+            p = self.params['metrics'][m]
+            x, y, metric = (a[::-1], b[::-1], m[:-len('_reversed')]) if m.endswith('_reversed') else (a, b, m)
+
+            base_t, mis_t, special_t = sim_measures.lgm_sim_split(x, y, p['split_thres'])
+            base_score, mis_score, special_score = sim_measures.score_per_term(base_t, mis_t, special_t, metric)
+            weights = sim_measures.recalculate_weights(base_t, mis_t, special_t, avg=True, weights=list(p['weights']))
+            scores.append(base_score * weights[0] + mis_score * weights[1] + special_score * weights[2])
+
+        return scores
+
+    def predict_proba(self, df):
+        """Score the pairs of ``df``, where each LGM-Sim score is rescaled linearly on each side of its threshold,
+        which is mapped to 0.5, and the lowest one is the probability of a pair to match.
+
+        Returns
+        -------
+        ndarray, shape = [n_samples, 2]
+        """
+        thres = np.asarray([self.params['metrics'][m]['threshold'] for m in self.metrics])
+        s = self.scores(df)
+        rescaled = np.where(s < thres, s / thres / 2, 0.5 + (s - thres) / np.maximum(1 - thres, 1e-12) / 2)
+
+        proba = np.clip(rescaled.min(axis=1), 0, 1)
+        return np.column_stack([1 - proba, proba])
+
+    def predict(self, df):
+        """Return whether each pair of ``df`` matches."""
+        thres = np.asarray([self.params['metrics'][m]['threshold'] for m in self.metrics])
+        return (self.scores(df) >= thres).all(axis=1).astype(int)
@@ -0,0 +1,386 @@
+"""Hyperparameter search whose trials, i.e., the score of each candidate on each fold, are persisted as they complete,
+so that an interrupted search is resumed rather than restarted."""
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import xgboost as xgb
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import StratifiedShuffleSplit
+from sklearn.utils import resample
+
+from poi_interlinking import config
+from poi_interlinking.misc.cache import dataset_key
+
+
+class TrialLog:
+    """An append-only log of evaluated trials, stored as one JSON line per trial in
+    :attr:`~poi_interlinking.config.trial_log_path`.
+
+    A log is keyed by a hash of the dataset, the feature configuration and the settings that the scores of the trials
+    depend on, i.e., the scoring metric, the folds and the train split, see :meth:`key`. A trial is identified by its
+    classifier, parameters, fold and budget, where the parameters are all the ones of its estimator, i.e., including
+    the ones out of the search space, e.g., of :attr:`~poi_interlinking.config.MLConf.clf_custom_params`, but its
+    parallelism.
+
+    Parameters
+    ----------
+    key: str
+        The key of the log, see :meth:`key`.
+    resume: bool
+        Whether to reuse the trials already in the log. Otherwise, the log is started over.
+    path: str, optional
+        Defaults to :attr:`~poi_interlinking.config.trial_log_path`.
+    """
+    def __init__(self, key, resume=False, path=None):
+        path = config.trial_log_path if path is None else path
+        os.makedirs(path, exist_ok=True)
+
+        self.fname = os.path.join(path, f'trials_{key}.jsonl')
+        self.trials = dict()
+        if resume and os.path.isfile(self.fname):
+            self._load()
+            print(f'Resuming {len(self.trials)} trials from {self.fname}')
+        else:
+            open(self.fname, 'w').close()
+
+    @staticmethod
+    def key(fname, freq_files, encoding, clf_method, n_splits):
+        """Compute the key of the log of trials on dataset ``fname``.
+
+        Parameters
+        ----------
+        fname: str
+            Path to the dataset.
+        freq_files: :obj:`list` of str
+            Paths to the loaded frequent terms files.
+        encoding: str
+            The encoding of the dataset. Valid options are *latin* or *global*.
+        clf_method: str
+            The classification group of features.
+        n_splits: int
+            Number of folds that trials are evaluated on.
+
+        Returns
+        -------
+        str
+            A hex digest that identifies the trials.
+        """
+        h = hashlib.sha256(dataset_key(fname, freq_files, encoding, clf_method).encode('utf8'))
+        h.update(json.dumps(dict(
+            score=config.MLConf.score, n_splits=n_splits, seed_no=config.seed_no, test_size=config.test_size,
+            xgb_early_stopping_rounds=config.MLConf.xgb_early_stopping_rounds,
+            xgb_validation_size=config.MLConf.xgb_validation_size, xgb_eval_metric=config.MLConf.xgb_eval_metric,
+        ), sort_keys=True).encode('utf8'))
+
+        return h.hexdigest()
+
+    def get(self, name, params, fold, n_resources=None):
+        """Return the logged ``(score, fit_time, score_time)`` of a trial, followed by its boosting rounds if early
+        stopped, or ``None`` if it is not evaluated yet.
+        """
+        return self.trials.get(self._trial_id(name, params, fold, n_resources))
+
+    def append(self, name, params, fold, n_resources, result):
+        """Log the ``(score, fit_time, score_time)`` of a trial, followed by its boosting rounds if early stopped."""
+        trial = self._trial_id(name, params, fold, n_resources)
+        self.trials[trial] = result
+        with open(self.fname, 'a', encoding='utf8') as f:
+            f.write(json.dumps(dict(trial=trial, result=list(result))) + '\n')
+
+    def _load(self):
+        with open(self.fname, 'rb+') as f:
+            data = f.read()
+            # the last line of an interrupted run may be partially written, which is dropped before appending
+            f.truncate(data.rfind(b'\n') + 1)
+
+        for line in data.splitlines()[:data.count(b'\n')]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self.trials[entry['trial']] = tuple(entry['result'])
+
+    @staticmethod
+    def _trial_id(name, params, fold, n_resources):
+        # candidates are sampled anew on each run, so params are only compared, never restored, from their dump
+        return json.dumps([name, params, fold, n_resources], sort_keys=True, default=str)
+
+
+class TrialSearch:
+    """Cross-validated search over given parameter settings of an estimator that evaluates the trials not found in a
+    :class:`TrialLog` and logs each one as soon as it completes.
+
+    It exposes the ``best_score_``, ``best_params_``, ``best_estimator_``, ``cv_results_`` and ``scorer_`` attributes of
+    the searches of scikit-learn. When ``resource`` is given, the candidates are searched by successive halving, as in
+    :class:`~sklearn.model_selection.HalvingRandomSearchCV`, which additionally exposes ``n_iterations_``,
+    ``n_resources_`` and ``max_resources_``.
+
+    Parameters
+    ----------
+    estimator: estimator
+        The estimator to tune.
+    candidates: :obj:`list` of dict
+        The parameter settings to evaluate, e.g., of a :class:`~sklearn.model_selection.ParameterGrid` or
+        :class:`~sklearn.model_selection.ParameterSampler`.
+    cv: cross-validation generator
+        The folds to evaluate each candidate on.
+    name: str
+        The name of the classifier, which trials are logged under.
+    trials: :class:`TrialLog`, optional
+        The log to look up and append trials to. None disables logging.
+    n_jobs: int, optional
+        Number of trials to evaluate in parallel.
+    resource: str, optional
+        The budget of successive halving, i.e., *n_samples* or a parameter of ``estimator``. None evaluates all
+        candidates on the whole train folds.
+    min_resources: int, optional
+        The budget of the first round. Defaults to two samples per class and fold.
+    max_resources: int, optional
+        The largest budget. Defaults to the number of samples.
+    factor: int
+        The proportion of candidates promoted, and the growth of their budget, per round.
+    patience: int, optional
+        Stop evaluating the candidates, in their given order, once as many of them in a row have not improved the best
+        score by more than ``tol``. None evaluates all of them. It does not apply to successive halving.
+    tol: float
+        The least improvement of the best score that resets ``patience``.
+    early_stopping_rounds: int, optional
+        Train ``estimator``, an :class:`~xgboost.XGBClassifier`, with the native API of xgboost on quantized data, which
+        is built once per fold and shared by all candidates, and stop boosting once the score on a held-out split of
+        the train fold does not improve for as many rounds. The candidate that is refit on all data is boosted for the
+        mean number of rounds it was early stopped at, i.e., the ``n_estimators`` of ``best_params_``.
+    """
+    def __init__(self, estimator, candidates, cv, name, trials=None, n_jobs=None, resource=None, min_resources=None,
+                 max_resources=None, factor=3, patience=None, tol=0., early_stopping_rounds=None):
+        self.estimator = estimator
+        self.candidates = candidates
+        self.cv = cv
+        self.name = name
+        self.trials = trials
+        self.n_jobs = n_jobs
+        self.resource = resource
+        self.min_resources = min_resources
+        self.max_resources = max_resources
+        self.factor = factor
+        self.patience = patience
+        self.tol = tol
+        self.early_stopping_rounds = early_stopping_rounds
+
+    def fit(self, X, y, **fit_params):
+        """Evaluate the candidates on ``X``, ``y`` and refit the best one on all of them."""
+        self.scorer_ = get_scorer(config.MLConf.score)
+        splits = list(self.cv.split(X, y))
+        self.n_splits_ = len(splits)
+        self.n_resumed_ = 0
+        self._dmatrices = dict()
+
+        if self.resource is not None:
+            best = self._halve(X, y, splits, fit_params)
+        elif self.patience is not None:
+            best = self._until_plateau(X, y, splits, fit_params)
+        else:
+            self.cv_results_ = self._evaluate(X, y, splits, list(self.candidates), fit_params)
+            best = int(np.argmax(self.cv_results_['mean_test_score']))
+
+        self.best_score_ = self.cv_results_['mean_test_score'][best]
+        self.best_params_ = self.cv_results_['params'][best]
+        if self.early_stopping_rounds is not None:
+            self.best_params_ = dict(
+                self.best_params_, n_estimators=int(round(self.cv_results_['mean_n_rounds'][best]))
+            )
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y, **fit_params)
+        # quantized data is not kept along with the fitted search
+        self._dmatrices = dict()
+
+        return self
+
+    def _halve(self, X, y, splits, fit_params):
+        n_candidates = len(self.candidates)
+        self.max_resources_ = X.shape[0] if self.max_resources is None else self.max_resources
+        min_resources = self.min_resources
+        if min_resources is None: min_resources = self.n_splits_ * 2 * len(np.unique(y))
+
+        # a round per promotion of candidates, as long as the budget does not exceed the largest one
+        n_iterations = 1
+        while self.factor ** n_iterations <= n_candidates and \
+                min_resources * self.factor ** n_iterations <= self.max_resources_:
+            n_iterations += 1
+
+        self.n_iterations_ = n_iterations
+        self.n_resources_ = []
+        results = []
+        remaining = list(self.candidates)
+        for i in range(n_iterations):
+            n_resources = min_resources * self.factor ** i
+            self.n_resources_.append(n_resources)
+            res = self._evaluate(X, y, splits, remaining, fit_params, n_resources)
+            res['iter'] = np.full(len(remaining), i)
+            results.append(res)
+
+            n_keep = -(-n_candidates // self.factor ** (i + 1))
+            top = np.argsort(-res['mean_test_score'], kind='stable')[:n_keep]
+            remaining = [remaining[j] for j in top]
+
+        self.cv_results_ = _concat(results)
+        # the best candidate of the last round
+        last = np.flatnonzero(self.cv_results_['iter'] == n_iterations - 1)
+        return int(last[np.argmax(self.cv_results_['mean_test_score'][last])])
+
+    def _until_plateau(self, X, y, splits, fit_params):
+        candidates = list(self.candidates)
+        # as many candidates at a time as keep the jobs busy on their folds
+        step = max(effective_n_jobs(self.n_jobs) // self.n_splits_, 1)
+
+        results = []
+        best_score, since_best = -np.inf, 0
+        for i in range(0, len(candidates), step):
+            res = self._evaluate(X, y, splits, candidates[i:i + step], fit_params, verbose=False)
+            results.append(res)
+            for score in res['mean_test_score']:
+                if score > best_score + self.tol: since_best = 0
+                else: since_best += 1
+                best_score = max(best_score, score)
+            if since_best >= self.patience: break
+
+        self.cv_results_ = _concat(results)
+        n_evaluated = len(self.cv_results_['params'])
+        # the first candidate is the one the search is started from, e.g., the previous best configuration
+        print(f'Evaluated {n_evaluated} of {len(candidates)} candidates on {self.n_splits_} folds'
+              f'{f", {self.n_resumed_} trials of which were resumed" if self.n_resumed_ else ""}, starting from a '
+              f'score of {self.cv_results_["mean_test_score"][0]:.4f}'
+              f'{"; the best score has plateaued" if n_evaluated < len(candidates) else ""}')
+
+        return int(np.argmax(self.cv_results_['mean_test_score']))
+
+    def _evaluate(self, X, y, splits, candidates, fit_params, n_resources=None, verbose=True):
+        if self.resource is not None and self.resource != 'n_samples':
+            candidates = [dict(p, **{self.resource: n_resources}) for p in candidates]
+
+        scores = dict()
+        pending = []
+        trial_params = [self._trial_params(p) for p in candidates]
+        for i, params in enumerate(trial_params):
+            for k in range(len(splits)):
+                logged = self.trials.get(self.name, params, k, n_resources) if self.trials is not None else None
+                if logged is None: pending.append((i, k))
+                else: scores[i, k] = logged
+
+        n_fits = len(candidates) * len(splits)
+        self.n_resumed_ += n_fits - len(pending)
+        if verbose:
+            print(f'Fitting {len(splits)} folds for each of {len(candidates)} candidates, totalling {n_fits} fits'
+                  f'{f" on a budget of {n_resources} {self.resource}" if n_resources is not None else ""}'
+                  f'{f"; {n_fits - len(pending)} of them are resumed" if len(pending) < n_fits else ""}')
+
+        if self.early_stopping_rounds is None:
+            out = Parallel(n_jobs=self.n_jobs, return_as='generator_unordered')(
+                delayed(_fit_and_score)(
+                    clone(self.estimator).set_params(**candidates[i]), X, y,
+                    self._train_idxs(y, splits[k][0], n_resources), splits[k][1], self.scorer_, fit_params, (i, k)
+                ) for i, k in pending
+            )
+        else:
+            # trials run in turn, as the quantized data of the folds is shared, on the threads of xgboost
+            out = (
+                ((i, k), self._boost_and_score(candidates[i], X, y, splits[k], k, n_resources)) for i, k in pending
+            )
+        for (i, k), result in out:
+            scores[i, k] = result
+            if self.trials is not None: self.trials.append(self.name, trial_params[i], k, n_resources, result)
+
+        res = np.asarray([[scores[i, k][:3] for k in range(len(splits))] for i in range(len(candidates))])
+        results = dict(params=candidates)
+        for k in range(len(splits)):
+            results[f'split{k}_test_score'] = res[:, k, 0]
+        results.update(
+            mean_test_score=res[:, :, 0].mean(axis=1), std_test_score=res[:, :, 0].std(axis=1),
+            mean_fit_time=res[:, :, 1].mean(axis=1), mean_score_time=res[:, :, 2].mean(axis=1),
+        )
+        if n_resources is not None: results['n_resources'] = np.full(len(candidates), n_resources)
+        if self.early_stopping_rounds is not None:
+            results['mean_n_rounds'] = np.asarray([
+                np.mean([scores[i, k][3] for k in range(len(splits))]) for i in range(len(candidates))
+            ])
+
+        return results
+
+    def _trial_params(self, candidate):
+        # trials of the same candidate on differently configured estimators, e.g., by another search method, differ
+        params = clone(self.estimator).set_params(**candidate).get_params(deep=False)
+        return {k: v for k, v in params.items() if k not in ['n_jobs', 'nthread']}
+
+    def _boost_and_score(self, params, X, y, split, fold, n_resources):
+        nthread = effective_n_jobs(self.n_jobs)
+        if (fold, n_resources) not in self._dmatrices:
+            train_idxs, test_idxs = self._train_idxs(y, split[0], n_resources), split[1]
+            inner, val = next(StratifiedShuffleSplit(
+                n_splits=1, test_size=config.MLConf.xgb_validation_size, random_state=config.seed_no
+            ).split(train_idxs, y[train_idxs]))
+            dtrain = xgb.QuantileDMatrix(X[train_idxs[inner]], y[train_idxs[inner]], nthread=nthread)
+            self._dmatrices[fold, n_resources] = (
+                dtrain,
+                xgb.QuantileDMatrix(X[train_idxs[val]], y[train_idxs[val]], ref=dtrain, nthread=nthread),
+                xgb.DMatrix(X[test_idxs], nthread=nthread),
+            )
+        dtrain, dval, dtest = self._dmatrices[fold, n_resources]
+
+        model = clone(self.estimator).set_params(**params)
+        xgb_params = {k: v for k, v in model.get_xgb_params().items() if v is not None and k != 'n_jobs'}
+        xgb_params.update(tree_method='hist', nthread=nthread, eval_metric=config.MLConf.xgb_eval_metric)
+
+        start_time = time.time()
+        booster = xgb.train(
+            xgb_params, dtrain, num_boost_round=model.get_num_boosting_rounds(), evals=[(dval, 'validation')],
+            early_stopping_rounds=self.early_stopping_rounds, verbose_eval=False
+        )
+        fit_time = time.time() - start_time
+
+        start_time = time.time()
+        score = self.scorer_(_BoosterClassifier(booster, np.unique(y)), dtest, y[split[1]])
+
+        return float(score), fit_time, time.time() - start_time, booster.best_iteration + 1
+
+    def _train_idxs(self, y, train_idxs, n_resources):
+        if self.resource != 'n_samples' or n_resources >= self.max_resources_: return train_idxs
+
+        # each train fold is subsampled in proportion to the budget, the same on every run
+        n_samples = max(int(len(train_idxs) * n_resources / self.max_resources_), 1)
+        return resample(train_idxs, replace=False, n_samples=n_samples, random_state=config.seed_no,
+                        stratify=y[train_idxs])
+
+
+class _BoosterClassifier(ClassifierMixin, BaseEstimator):
+    """A binary booster of xgboost, up to its best iteration, as a classifier that scorers predict with."""
+    def __init__(self, booster, classes):
+        self.booster = booster
+        self.classes = classes
+        self.classes_ = classes
+
+    def predict_proba(self, X):
+        proba = self.booster.predict(X, iteration_range=(0, self.booster.best_iteration + 1))
+        return np.column_stack([1 - proba, proba])
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] >= 0.5).astype(int)]
+
+
+def _concat(results):
+    return {
+        k: [p for r in results for p in r[k]] if k == 'params' else np.concatenate([r[k] for r in results])
+        for k in results[0]
+    }
+
+
+def _fit_and_score(estimator, X, y, train_idxs, test_idxs, scorer, fit_params, trial):
+    start_time = time.time()
+    estimator.fit(X[train_idxs], y[train_idxs], **fit_params)
+    fit_time = time.time() - start_time
+
+    start_time = time.time()
+    score = scorer(estimator, X[test_idxs], y[test_idxs])
+
+    return trial, (float(score), fit_time, time.time() - start_time)
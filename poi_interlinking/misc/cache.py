@@ -0,0 +1,149 @@
+import os
+import glob
+import json
+import hashlib
+import numpy as np
+
+from poi_interlinking import config
+
+
+#: int: The version of the code that builds features, which is part of :func:`feature_version`. It should be bumped
+#: whenever a change of the code, e.g., of a similarity measure or of the street numbers and spatial features, changes
+#: the features built on the same input, so that features cached or stored by earlier versions are not reused.
+FEATURES_VERSION = 1
+
+
+def feature_version(freq_files, encoding, clf_method):
+    """Compute a hash of the feature configuration, i.e., :data:`FEATURES_VERSION`, the contents of the frequent
+    terms files and the config values that affect the built features, including the ones that datasets are parsed
+    with.
+
+    Parameters
+    ----------
+    freq_files: :obj:`list` of str
+        Paths to the loaded frequent terms files.
+    encoding: str
+        The encoding of the dataset. Valid options are *latin* or *global*.
+    clf_method: str
+        The classification group of features.
+
+    Returns
+    -------
+    str
+        A hex digest that changes whenever the configuration of the built features changes for the same input, or
+        their code given that :data:`FEATURES_VERSION` is bumped.
+    """
+    h = hashlib.sha256()
+    h.update(f'features-v{FEATURES_VERSION}'.encode('utf8'))
+    for f in sorted(freq_files):
+        _update_with_file(h, f)
+
+    h.update(json.dumps(dict(
+        classification_method=clf_method.lower(),
+        sim_opt_params=config.MLConf.sim_opt_params[encoding.lower()],
+        sort_thres=config.sort_thres,
+        use_cols=config.use_cols,
+        freq_term_size=config.freq_term_size,
+        distance_method=config.distance_method,
+        selected_features=config.MLConf.selected_features,
+        delimiter=config.delimiter,
+        fieldnames=config.fieldnames,
+        col_dtypes=config.col_dtypes,
+    ), sort_keys=True, default=str).encode('utf8'))
+
+    return h.hexdigest()
+
+
+def dataset_key(fname, freq_files, encoding, clf_method):
+    """Compute a hash of a dataset along with the configuration of the features built on it.
+
+    Parameters
+    ----------
+    fname: str
+        Path to the dataset.
+    freq_files: :obj:`list` of str
+        Paths to the loaded frequent terms files.
+    encoding: str
+        The encoding of the dataset. Valid options are *latin* or *global*.
+    clf_method: str
+        The classification group of features.
+
+    Returns
+    -------
+    str
+        A hex digest that identifies the built features.
+    """
+    h = hashlib.sha256()
+    _update_with_file(h, fname)
+    h.update(feature_version(freq_files, encoding, clf_method).encode('utf8'))
+    # the feature store holds raw features, so the dtype is only part of the key of the built ones
+    h.update(config.feature_dtype.encode('utf8'))
+
+    return h.hexdigest()
+
+
+def _update_with_file(h, fname, chunk_size=1 << 20):
+    with open(fname, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+
+
+class FeatureCache:
+    """Stores built features on disk, keyed by a hash of their inputs, so that they can be reused across runs.
+
+    The key of each entry is computed on the contents of the dataset, the contents of the frequent terms files and the
+    config values that affect the built features. The least recently used entries are evicted whenever the total size
+    of the cache exceeds :attr:`~poi_interlinking.config.cache_max_size`.
+    """
+    def __init__(self, path=None, max_size=None):
+        self.path = config.cache_path if path is None else path
+        self.max_size = config.cache_max_size if max_size is None else max_size
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, fname, freq_files, encoding, clf_method):
+        """Compute the key of the features built on ``fname``, see :func:`dataset_key`."""
+        return dataset_key(fname, freq_files, encoding, clf_method)
+
+    def load(self, key):
+        """Return the cached ``(fX, y)`` arrays for ``key`` or ``None`` if there is no valid entry."""
+        fpath = self._entry_path(key)
+        if not os.path.isfile(fpath): return None
+
+        try:
+            with np.load(fpath) as data:
+                fX, y = data['fX'], data['y']
+        except (OSError, ValueError, KeyError) as err:
+            print(f'Ignoring invalid cache entry {fpath}: {err}')
+            return None
+
+        # mark entry as recently used
+        os.utime(fpath)
+        print(f'Loaded features from cache entry {fpath}')
+
+        return fX, y
+
+    def save(self, key, fX, y):
+        """Store the ``(fX, y)`` arrays under ``key`` and evict old entries if the cache exceeds its size."""
+        fpath = self._entry_path(key)
+        tmp_path = f'{fpath}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, fX=fX, y=y)
+        os.replace(tmp_path, fpath)
+
+        self._evict(keep=fpath)
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, f'features_{key}.npz')
+
+    def _evict(self, keep):
+        entries = sorted(glob.glob(os.path.join(self.path, 'features_*.npz')), key=os.path.getmtime)
+        total_size = sum(os.path.getsize(f) for f in entries)
+
+        for f in entries:
+            if total_size <= self.max_size: break
+            if f == keep: continue
+
+            total_size -= os.path.getsize(f)
+            os.remove(f)
+            print(f'Evicted cache entry {f}')
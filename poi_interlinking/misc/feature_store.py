@@ -0,0 +1,140 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+from poi_interlinking import config
+
+
+class FeatureStore:
+    """Persists the features of each POI pair, keyed by ``(ID1, ID2, content hash)``, so that only new or changed
+    pairs are computed when a dataset grows.
+
+    Entries are stored as append-only chunks under a folder named after the feature version, i.e., the output of
+    :func:`~poi_interlinking.misc.cache.feature_version`, in :attr:`~poi_interlinking.config.feature_store_path`. Thus,
+    any change in the feature configuration switches to a new, empty, folder and invalidates the previous entries.
+    The chunks are merged into one whenever their number exceeds :attr:`max_chunks`.
+
+    Parameters
+    ----------
+    version: str
+        The feature version the stored features correspond to.
+    path: str, optional
+        Root folder of the store. Defaults to :attr:`~poi_interlinking.config.feature_store_path`.
+    """
+    max_chunks = 20
+
+    def __init__(self, version, path=None):
+        root = config.feature_store_path if path is None else path
+        self.path = os.path.join(root, version)
+
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def keys(df):
+        """Return the ``(id1, id2, hash)`` key of each pair in ``df``.
+
+        The hash is computed on the columns of :attr:`~poi_interlinking.config.use_cols`, excluding index, IDs and
+        status, so that a pair whose names, addresses or coordinates are modified gets a new key.
+        """
+        assert 'ID1' in config.use_cols and 'ID2' in config.use_cols, \
+            'The feature store requires the ID1 and ID2 columns to be defined in use_cols'
+
+        content_cols = [
+            v for k, v in config.use_cols.items() if k not in ['index', 'ID1', 'ID2', 'status'] and v in df.columns
+        ]
+        return pd.DataFrame({
+            'id1': df[config.use_cols['ID1']].astype(str).to_numpy(),
+            'id2': df[config.use_cols['ID2']].astype(str).to_numpy(),
+            'hash': pd.util.hash_pandas_object(df[content_cols], index=False).to_numpy(),
+        })
+
+    def get_or_compute(self, df, func):
+        """Return the features of every pair in ``df``, computing with ``func`` only the pairs not found in the store.
+
+        Parameters
+        ----------
+        df: :obj:`pandas.DataFrame`
+            The POI pairs.
+        func: callable
+            Called on the sub-frame of missing pairs and returns their features as a 2d ndarray.
+
+        Returns
+        -------
+        ndarray
+            The features of the pairs, in the order of ``df``.
+        """
+        keys = self.keys(df)
+        stored_keys, stored_fX = self._load()
+
+        pos = keys.merge(
+            stored_keys.assign(pos=np.arange(len(stored_keys))), on=['id1', 'id2', 'hash'], how='left'
+        )['pos'].to_numpy()
+        missing = np.isnan(pos)
+        print(f'{np.count_nonzero(~missing)} pairs loaded from feature store {self.path}, '
+              f'{np.count_nonzero(missing)} to be computed')
+
+        if not missing.any(): return stored_fX[pos.astype(np.intp)]
+
+        new_fX = func(df[missing].reset_index(drop=True))
+        self._append(keys[missing], new_fX)
+        if missing.all(): return new_fX
+
+        fX = np.empty((len(df), new_fX.shape[1]), dtype=new_fX.dtype)
+        fX[~missing] = stored_fX[pos[~missing].astype(np.intp)]
+        fX[missing] = new_fX
+
+        return fX
+
+    def _chunks(self):
+        return sorted(glob.glob(os.path.join(self.path, 'chunk_*.npz')))
+
+    def _load(self):
+        keys, fX = [], []
+        for f in self._chunks():
+            with np.load(f) as data:
+                keys.append(pd.DataFrame({'id1': data['id1'], 'id2': data['id2'], 'hash': data['hash']}))
+                fX.append(data['fX'])
+
+        if not keys:
+            return pd.DataFrame({
+                'id1': np.array([], dtype=object), 'id2': np.array([], dtype=object),
+                'hash': np.array([], dtype=np.uint64)
+            }), None
+
+        keys, fX = pd.concat(keys, ignore_index=True), np.concatenate(fX)
+        # later chunks override the entries of earlier ones
+        last = ~keys.duplicated(keep='last').to_numpy()
+        return keys[last].reset_index(drop=True), fX[last]
+
+    def _append(self, keys, fX):
+        last = ~keys.duplicated(keep='last').to_numpy()
+        keys, fX = keys[last], fX[last]
+
+        self._write(self._next_chunk(), keys, fX)
+
+        if len(self._chunks()) > self.max_chunks: self._compact()
+
+    def _next_chunk(self):
+        chunks = self._chunks()
+        n = int(os.path.basename(chunks[-1])[len('chunk_'):-len('.npz')]) + 1 if chunks else 0
+        return os.path.join(self.path, f'chunk_{n:06d}.npz')
+
+    def _compact(self):
+        chunks = self._chunks()
+        keys, fX = self._load()
+
+        # the merged chunk sorts after the old ones, so that the store remains valid if interrupted
+        self._write(self._next_chunk(), keys, fX)
+        for f in chunks: os.remove(f)
+        print(f'Compacted {len(chunks)} chunks of feature store {self.path}')
+
+    @staticmethod
+    def _write(fpath, keys, fX):
+        tmp_path = f'{fpath}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f, id1=keys['id1'].to_numpy(dtype=str), id2=keys['id2'].to_numpy(dtype=str),
+                hash=keys['hash'].to_numpy(dtype=np.uint64), fX=fX
+            )
+        os.replace(tmp_path, fpath)
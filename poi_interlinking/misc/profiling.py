@@ -0,0 +1,159 @@
+import json
+import time
+import tracemalloc
+from beautifultable import BeautifulTable
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null_stage = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('profiler', 'path', 'start', 'traced', 'own_tracing', 'mem_start', 'saved_peak', 'nested_peak')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        stack = profiler._stack
+        self.path = f'{stack[-1].path}/{name}' if stack else name
+
+    def __enter__(self):
+        p = self.profiler
+        stats = p.stats.get(self.path)
+        if stats is None: stats = p.stats[self.path] = dict(calls=0, time=0.0, sampled_calls=0, alloc=0, max_alloc=0)
+        stats['calls'] += 1
+
+        self.traced = p.sample_rate is not None and stats['calls'] % p.sample_rate == 0
+        if self.traced:
+            self.own_tracing = not tracemalloc.is_tracing()
+            if self.own_tracing: tracemalloc.start()
+            self.saved_peak = tracemalloc.get_traced_memory()[1]
+            self.nested_peak = 0
+            tracemalloc.reset_peak()
+            self.mem_start = tracemalloc.get_traced_memory()[0]
+
+        p._stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        p = self.profiler
+        p._stack.pop()
+
+        stats = p.stats[self.path]
+        stats['time'] += elapsed
+
+        if self.traced:
+            peak = max(tracemalloc.get_traced_memory()[1], self.nested_peak)
+            stats['sampled_calls'] += 1
+            stats['alloc'] += peak - self.mem_start
+            stats['max_alloc'] = max(stats['max_alloc'], peak - self.mem_start)
+
+            if self.own_tracing:
+                tracemalloc.stop()
+            else:
+                # the peak of the enclosing traced stage was reset on entering this one
+                outer = next(s for s in reversed(p._stack) if s.traced)
+                outer.nested_peak = max(outer.nested_peak, self.saved_peak, peak)
+
+        return False
+
+
+class Profiler:
+    """Records the wall time, number of calls and, on a sample of the calls, the peak memory allocated by named stages
+    of code, e.g., the computation of each similarity metric while building features.
+
+    Stages are nested, i.e., a stage entered while another one is active is recorded under the path
+    ``<outer>/<inner>``. Recording is disabled by default, so that :meth:`stage` costs a single attribute check.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = None
+        self.stats = dict()
+        self._stack = []
+
+    def start(self, sample_rate=None):
+        """Enable recording.
+
+        Parameters
+        ----------
+        sample_rate: int, optional
+            Allocations are traced, with :mod:`tracemalloc`, on every ``sample_rate``-th call of each stage. Stages
+            called fewer times are not traced. None disables tracing allocations.
+        """
+        self.enabled = True
+        self.sample_rate = sample_rate
+
+    def stop(self):
+        """Disable recording. The recorded stats are kept."""
+        self.enabled = False
+
+    def reset(self):
+        """Discard the recorded stats."""
+        self.stats = dict()
+
+    def stage(self, name):
+        """Return a context manager that records the code it encloses under ``name``."""
+        if not self.enabled: return _null_stage
+        return _Stage(self, name)
+
+    def report(self):
+        """Return the recorded stats per stage.
+
+        Returns
+        -------
+        dict
+            A structured report with the total time of the top level stages and, per stage, its number of calls, total
+            and mean wall time in seconds, share of the total time and, when traced, the mean and max peak allocation
+            in bytes over the sampled calls.
+        """
+        total = sum(s['time'] for path, s in self.stats.items() if '/' not in path)
+
+        stages = []
+        for path, s in self.stats.items():
+            stages.append(dict(
+                stage=path, calls=s['calls'], time=s['time'], mean_time=s['time'] / s['calls'],
+                share=s['time'] / total if total else 0.0, sampled_calls=s['sampled_calls'],
+                mean_alloc=s['alloc'] / s['sampled_calls'] if s['sampled_calls'] else None,
+                max_alloc=s['max_alloc'] if s['sampled_calls'] else None,
+            ))
+
+        return dict(total_time=total, sample_rate=self.sample_rate, stages=stages)
+
+    def save(self, fpath):
+        """Write the :meth:`report` as JSON to ``fpath``."""
+        with open(fpath, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary(self, top=None):
+        """Return a table of the stages, sorted by descending total time.
+
+        Parameters
+        ----------
+        top: int, optional
+            Show only this number of stages.
+        """
+        stages = sorted(self.report()['stages'], key=lambda s: s['time'], reverse=True)
+
+        table = BeautifulTable(maxwidth=160)
+        table.columns.header = ['stage', 'calls', 'time (s)', 'mean (ms)', 'share', 'mean alloc (KB)']
+        for s in stages[:top]:
+            table.rows.append([
+                s['stage'], s['calls'], f'{s["time"]:.3f}', f'{s["mean_time"] * 1000:.4f}', f'{s["share"]:.1%}',
+                '-' if s['mean_alloc'] is None else f'{s["mean_alloc"] / 1024:.1f}'
+            ])
+        table.set_style(BeautifulTable.STYLE_RST)
+        table.columns.alignment['stage'] = BeautifulTable.ALIGN_LEFT
+
+        return table
+
+
+#: :class:`Profiler`: The profiler that records the stages of building features.
+profiler = Profiler()
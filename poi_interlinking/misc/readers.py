@@ -0,0 +1,183 @@
+import os
+import json
+import pandas as pd
+
+from poi_interlinking import config
+
+
+def string_dtype():
+    """Return the dtype that string columns are loaded as, i.e., :attr:`~poi_interlinking.config.string_dtype`, or
+    *category* if it requires pyarrow that is not installed.
+    """
+    if config.string_dtype == 'string[pyarrow]':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print('pyarrow is not installed; string columns are loaded as category')
+            return 'category'
+
+    return config.string_dtype
+
+
+def file_format(fname):
+    """Return the format of dataset ``fname`` by its extension, i.e., *parquet*, *arrow* (Arrow IPC/Feather) or *csv*
+    for any other delimited text.
+    """
+    ext = os.path.splitext(fname)[1].lower()
+    if ext in ['.parquet', '.pq']: return 'parquet'
+    if ext in ['.arrow', '.feather', '.ipc']: return 'arrow'
+    return 'csv'
+
+
+def read_pairs(fname, keys=None):
+    """
+    Loads a dataset of POI pairs with the dtypes defined in :attr:`~poi_interlinking.config.col_dtypes`. Names,
+    addresses and IDs are stored in the compact dtype returned by :func:`string_dtype` and their missing values are
+    replaced by empty strings.
+
+    Parquet and Arrow IPC files, see :func:`file_format`, are memory-mapped and only the requested columns are read,
+    i.e., no text is parsed.
+
+    Args:
+        fname (:obj:`str`): Path of the dataset to load.
+        keys (:obj:`list` of :obj:`str`): The keys of :attr:`~poi_interlinking.config.use_cols` to load. Defaults to
+            all of them. Every column is loaded when :attr:`~poi_interlinking.config.all_cols` is enabled.
+
+    Returns:
+        :obj:`pandas.DataFrame`: The loaded dataset.
+    """
+    keys = list(config.use_cols) if keys is None else keys
+    dtypes = _dtypes(keys)
+    columns = None if config.all_cols else [config.use_cols[k] for k in keys]
+
+    fmt = file_format(fname)
+    if fmt == 'csv':
+        df = pd.read_csv(fname, sep=config.delimiter, names=config.fieldnames, dtype=dtypes, usecols=columns,
+                         na_filter=True, encoding='utf8')
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        df = _to_pandas(pq.read_table(fname, columns=columns, memory_map=True))
+    else:
+        table = _open_arrow(fname).read_all()
+        df = _to_pandas(table if columns is None else table.select(columns))
+
+    return _apply_dtypes(df, dtypes)
+
+
+def iter_pairs(fname, keys=None, batch_size=None):
+    """
+    Streams a dataset of POI pairs in batches of rows, each one loaded as in :func:`read_pairs`. Parquet and Arrow IPC
+    files are read record batch by record batch from a memory map, whereas delimited text in chunks.
+
+    Args:
+        fname (:obj:`str`): Path of the dataset to load.
+        keys (:obj:`list` of :obj:`str`): The keys of :attr:`~poi_interlinking.config.use_cols` to load. Defaults to
+            all of them.
+        batch_size (:obj:`int`): The maximum number of rows per batch. Defaults to
+            :attr:`~poi_interlinking.config.batch_size`. Arrow IPC files are streamed in the batches they are stored.
+
+    Yields:
+        :obj:`pandas.DataFrame`: The next batch of the dataset.
+    """
+    keys = list(config.use_cols) if keys is None else keys
+    batch_size = config.batch_size if batch_size is None else batch_size
+    dtypes = _dtypes(keys)
+    columns = None if config.all_cols else [config.use_cols[k] for k in keys]
+
+    fmt = file_format(fname)
+    if fmt == 'csv':
+        batches = pd.read_csv(fname, sep=config.delimiter, names=config.fieldnames, dtype=dtypes, usecols=columns,
+                              na_filter=True, encoding='utf8', chunksize=batch_size)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        batches = (
+            _to_pandas(b)
+            for b in pq.ParquetFile(fname, memory_map=True).iter_batches(batch_size=batch_size, columns=columns)
+        )
+    else:
+        reader = _open_arrow(fname)
+        batches = (
+            _to_pandas(reader.get_batch(i) if columns is None else reader.get_batch(i).select(columns))
+            for i in range(reader.num_record_batches)
+        )
+
+    for df in batches:
+        yield _apply_dtypes(df, dtypes)
+
+
+def pairs_from_records(records, keys=None):
+    """
+    Builds a dataset of POI pairs out of records, e.g., parsed from JSON, with the dtypes of :func:`read_pairs`, except
+    for strings that are kept as python objects, as small batches of records gain nothing from interning them.
+
+    Args:
+        records (:obj:`list` of dict): The pairs, each one with the columns of :attr:`~poi_interlinking.config.use_cols`
+            as keys.
+        keys (:obj:`list` of :obj:`str`): The keys of :attr:`~poi_interlinking.config.use_cols` that are required.
+            Defaults to all of them.
+
+    Returns:
+        :obj:`pandas.DataFrame`: The pairs.
+    """
+    keys = list(config.use_cols) if keys is None else keys
+    columns = [config.use_cols[k] for k in keys]
+
+    df = pd.DataFrame.from_records(records)
+    missing = set(columns) - set(df.columns)
+    assert not missing, f'Pairs should have the {sorted(missing)} fields'
+
+    return _apply_dtypes(df[columns].copy(), _dtypes(keys, object))
+
+
+def read_sim_params(fname):
+    """
+    Loads the learned parameters of similarity metrics written by
+    :func:`~poi_interlinking.misc.writers.write_sim_params`.
+
+    Args:
+        fname (:obj:`str`): Path of the parameters file.
+
+    Returns:
+        dict: The *sim_group*, *train_set* and *encoding* of the parameters along with the *metrics*.
+    """
+    with open(fname) as f:
+        return json.load(f)
+
+
+def _open_arrow(fname):
+    import pyarrow as pa
+
+    return pa.ipc.open_file(pa.memory_map(fname, 'r'))
+
+
+def _to_pandas(data):
+    import pyarrow as pa
+
+    # arrow strings are kept in arrow memory rather than converted to python objects
+    types_mapper = None
+    if string_dtype() == 'string[pyarrow]':
+        types_mapper = {pa.string(): pd.StringDtype('pyarrow'), pa.large_string(): pd.StringDtype('pyarrow')}.get
+
+    return data.to_pandas(types_mapper=types_mapper)
+
+
+def _dtypes(keys, str_dtype=None):
+    str_dtype = string_dtype() if str_dtype is None else str_dtype
+    return {
+        config.use_cols[k]: str_dtype if config.col_dtypes[k] == 'str' else config.col_dtypes[k]
+        for k in keys if k in config.col_dtypes
+    }
+
+
+def _apply_dtypes(df, dtypes):
+    for c, dt in dtypes.items():
+        if df[c].dtype != dt: df[c] = df[c].astype(dt)
+        # missing strings become empty ones, whereas numeric columns, e.g., coordinates, keep NaN
+        if not df[c].hasnans or pd.api.types.is_numeric_dtype(df[c].dtype): continue
+
+        if dt == 'category' and '' not in df[c].cat.categories: df[c] = df[c].cat.add_categories('')
+        df[c] = df[c].fillna('')
+
+    return df
@@ -1,25 +1,146 @@
 import os
 import csv
+import json
 import numpy as np
 
 from poi_interlinking import helpers
+from poi_interlinking.misc import readers
 from poi_interlinking import config
 
 
-def save_features(fpath, data, delimiter=',', cols=None):
+def save_features(fpath, index, values, labels, cols=None, label_col=None):
+    """
+    Writes features, or predictions, as a binary column-major ``.npy`` file, in their own dtype, along with a JSON
+    sidecar that holds its schema. The index and labels of the rows are written as int64 to a second ``_keys.npy``
+    file. The stored files can be loaded memory-mapped with :func:`load_features`.
+
+    Args:
+        fpath (:obj:`str`): Path to write. The schema is written to the same path with a *.json* extension.
+        index (ndarray): The index of each row.
+        values (ndarray): The values to store, e.g., the built features.
+        labels (ndarray): The label, or predicted class, of each row.
+        cols (:obj:`list` of :obj:`str`): Names of the ``values`` columns. Defaults to the built features of
+            :attr:`~poi_interlinking.config.MLConf.classification_method`.
+        label_col (:obj:`str`): Name of the ``labels`` column. Defaults to the status column of
+            :attr:`~poi_interlinking.config.use_cols`.
+    """
     h = helpers.StaticValues(config.MLConf.classification_method)
-    col_names = h.final_cols + ['class'] if cols is None else cols
-    col_format = ['%1.3f'] * (len(col_names) - 1) + ['%i']
+    col_names = h.final_cols if cols is None else cols
+    label_col = config.use_cols['status'] if label_col is None else label_col
     # TODO: transform to metric (temporal for saving)
     # data[:, 1] -= 1
     # data[:, 1] *= -1
     # data[:, -2] -= 1
     # data[:, -2] *= -1
 
-    np.savetxt(
-        fpath, data, header=f'{delimiter}'.join(['index'] + col_names), comments='',
-        fmt=f'{delimiter}'.join(['%i'] + col_format)
+    values = np.asfortranarray(values)
+    np.save(fpath, values)
+
+    base = os.path.splitext(fpath)[0]
+    np.save(f'{base}_keys.npy', np.column_stack((index, labels)).astype(np.int64))
+
+    schema = dict(
+        dtype=values.dtype.str, shape=values.shape, scale=helpers.quantization_scale(values.dtype),
+        columns=[dict(name=c, type=values.dtype.name) for c in col_names],
+        keys=dict(
+            file=f'{os.path.basename(base)}_keys.npy',
+            columns=[dict(name=config.use_cols['index'], type='int'), dict(name=label_col, type='int')]
+        )
     )
+    with open(f'{base}.json', 'w') as f:
+        json.dump(schema, f, indent=2)
+
+
+def load_features(fpath, mmap_mode='r'):
+    """
+    Loads, without copying them in memory, the values stored by :func:`save_features`.
+
+    Args:
+        fpath (:obj:`str`): Path of the *.npy* file to load.
+        mmap_mode (:obj:`str`): The mode used to memory-map the file. See :func:`numpy.load`.
+
+    Returns:
+        tuple of (ndarray, ndarray, dict): The memory-mapped values, their index and labels as a two-column array and
+        their schema.
+    """
+    with open(f'{os.path.splitext(fpath)[0]}.json') as f:
+        schema = json.load(f)
+
+    data = np.load(fpath, mmap_mode=mmap_mode)
+    assert list(data.shape) == schema['shape'], \
+        f'{fpath} has shape {data.shape} but {tuple(schema["shape"])} is expected by its schema'
+    assert schema['scale'] == helpers.quantization_scale(data.dtype), \
+        f'{fpath} is quantized with scale {schema["scale"]}, which is not supported'
+
+    keys = np.load(os.path.join(os.path.dirname(fpath), schema['keys']['file']), mmap_mode=mmap_mode)
+
+    return data, keys, schema
+
+
+def save_pairs(fname, fpath):
+    """
+    Converts a dataset of POI pairs to a Parquet or Arrow IPC file, depending on the extension of ``fpath``, so that
+    subsequent runs on it memory-map the required columns instead of parsing text. The dataset is streamed in batches
+    of :attr:`~poi_interlinking.config.batch_size` rows and its columns are stored in the dtypes of
+    :attr:`~poi_interlinking.config.col_dtypes`.
+
+    Args:
+        fname (:obj:`str`): Path of the dataset to convert.
+        fpath (:obj:`str`): Path to write.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fmt = readers.file_format(fpath)
+    assert fmt in ['parquet', 'arrow'], f'{fpath} should have a Parquet or Arrow IPC extension'
+
+    writer = None
+    for df in readers.iter_pairs(fname):
+        # categories are stored as plain strings, as each batch has its own
+        for c in df.select_dtypes('category').columns: df[c] = df[c].astype(object)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        if writer is None:
+            writer = pq.ParquetWriter(fpath, table.schema) if fmt == 'parquet' else pa.ipc.new_file(fpath, table.schema)
+        writer.write_table(table)
+
+    if writer is not None: writer.close()
+
+
+def write_scores(fpath, index, proba, append=False, pred=None):
+    """
+    Writes the predicted probabilities and classes of POI pairs as delimited text.
+
+    Args:
+        fpath (:obj:`str`): Path to write.
+        index (ndarray): The index of each pair.
+        proba (ndarray): The probability of each pair to be a non match and a match respectively.
+        append (bool): Whether to append to ``fpath``, without a header, instead of overwriting it.
+        pred (ndarray): The predicted class of each pair. Defaults to the most probable one.
+    """
+    pred = proba.argmax(axis=1) if pred is None else pred
+    with open(fpath, 'a' if append else 'w', newline='') as file:
+        writer = csv.writer(file, delimiter=config.delimiter)
+        if not append:
+            writer.writerow([config.use_cols['index'], 'prob_class_0', 'prob_class_1', 'pred_class'])
+        writer.writerows(zip(index.tolist(), proba[:, 0].tolist(), proba[:, 1].tolist(), pred.tolist()))
+
+
+def write_sim_params(fpath, sim_group, train_set, metrics, encoding=None):
+    """
+    Writes the learned parameters of similarity metrics as JSON, to be loaded by
+    :func:`~poi_interlinking.misc.readers.read_sim_params`.
+
+    Args:
+        fpath (:obj:`str`): Path to write.
+        sim_group (:obj:`str`): The group of the metrics (*basic* | *sorted* | *lgm*).
+        train_set (:obj:`str`): The dataset the parameters were learned on.
+        metrics (dict): Maps each metric to its *accuracy* and *threshold* and, for the *lgm* group, its *split_thres*
+            and *weights* too, i.e., the values of :attr:`~poi_interlinking.config.MLConf.sim_opt_params`.
+        encoding (:obj:`str`): The encoding of the frequent terms the *lgm* parameters were learned with.
+    """
+    with open(fpath, 'w') as f:
+        json.dump(dict(sim_group=sim_group, train_set=train_set, encoding=encoding, metrics=metrics), f, indent=2)
 
 
 def write_results(fpath, results, delimiter='&'):
@@ -1,10 +1,10 @@
-import csv
 from collections import Counter, defaultdict
 import itertools
 import os
 import re
 
 from poi_interlinking import config, helpers
+from poi_interlinking.misc import readers
 
 
 def extract_freqterms(fname, encoding, exp_path):
@@ -13,7 +13,8 @@ def extract_freqterms(fname, encoding, exp_path):
     Parameters
     ----------
     fname : str
-        Input filename to search for optimal thresholds.
+        Input filename to search for optimal thresholds. Delimited text, Parquet or Arrow IPC files are supported, see
+        :func:`~poi_interlinking.misc.readers.file_format`.
     encoding : str
         The encoding of the fname. Valid options are *latin* or *global*.
     exp_path : str
@@ -28,11 +29,9 @@ def extract_freqterms(fname, encoding, exp_path):
     }
 
     dstemmed = defaultdict(set)
-    with open(os.path.join(config.default_data_path, fname)) as csv_file:
-        reader = csv.DictReader(csv_file, fieldnames=config.fieldnames, delimiter=config.delimiter)
-
-        for row in reader:
-            a, b = helpers.transform(row[config.use_cols['s1']], row[config.use_cols['s2']], canonical=True)
+    for batch in readers.iter_pairs(os.path.join(config.default_data_path, fname), ['s1', 's2']):
+        for s1, s2 in zip(batch[config.use_cols['s1']], batch[config.use_cols['s2']]):
+            a, b = helpers.transform(s1, s2, canonical=True)
 
             for s in [a, b]:
                 ngram_tokens, ngram_tokens_stemmed, _ = helpers.normalize_str(s)
@@ -2,19 +2,28 @@
 # Author: vkaff
 # E-mail: vkaffes@imis.athena-innovation.gr
 
+import os
+import time
+from functools import partial
 from tqdm import tqdm
 import pandas as pd
 import numpy as np
 import re
 from sklearn import preprocessing
 
-from poi_interlinking import config
+from poi_interlinking import config, helpers
 from poi_interlinking.helpers import transform, StaticValues
 from poi_interlinking.processing import sim_measures
-from poi_interlinking.processing.spatial.matching import get_distance, Projection
+from poi_interlinking.processing.pairs import PairTable
+from poi_interlinking.processing.spatial.matching import get_distance, get_haversine_distance, Projection
+from poi_interlinking.misc.cache import FeatureCache, feature_version
+from poi_interlinking.misc.feature_store import FeatureStore
+from poi_interlinking.misc import readers, writers
+from poi_interlinking.misc.profiling import profiler
 
 tqdm.pandas()
 no_match = re.compile(r'\b\d+[a-zA-Z]?(-\d+[a-zA-Z]?)?\s*')
+no_digits = re.compile(r'\b(\d+)')
 
 
 class Features:
@@ -29,6 +38,11 @@ class Features:
     See Also
     --------
     :func:`compute_features`: Details on the metrics each classification group implements.
+
+    Attributes
+    ----------
+    verbose: bool
+        Whether the stages of building features print their progress.
     """
     # fields = [
     #     "s1",
@@ -42,17 +56,6 @@ class Features:
     #     "alpha2_cc2",
     # ]
 
-    # dtypes = {
-    #     config.use_cols['s1']: str, config.use_cols['s2']: str,
-    #     config.use_cols['addr1']: str, config.use_cols['addr2']: str,
-    #     config.use_cols['lon1']: float, config.use_cols['lon2']: float,
-    #     config.use_cols['lat1']: float, config.use_cols['lat2']: float,
-    #     config.use_cols['status']: bool,
-    #     # 'gid1': np.int32, 'gid2': np.int32,
-    #     # 'alphabet1': str, 'alphabet2': str,
-    #     # 'alpha2_cc1': str, 'alpha2_cc2': str
-    # }
-
     d = {
         'TRUE': True,
         'FALSE': False
@@ -62,13 +65,25 @@ class Features:
 
     def __init__(self):
         self.clf_method = config.MLConf.classification_method
-        self.data_df = None
+        self.selected_features = config.MLConf.selected_features
+        self.verbose = True
+        self.pairs = None
+        self.built_data = None
+        self.fname = None
+        self.encoding = None
 
     def load_data(self, fname, encoding):
-        self.data_df = pd.read_csv(fname, sep=config.delimiter, names=config.fieldnames,  # dtype=self.dtypes,
-                                   usecols=None if config.all_cols else config.use_cols.values(),
-                                   na_filter=True, encoding='utf8')
-        self.data_df.fillna('', inplace=True)
+        self.fname = fname
+        self.encoding = encoding
+        self.built_data = None
+
+        if os.path.splitext(fname)[1] == '.npy':
+            # already built features, as stored by writers.save_features, are memory-mapped
+            self.built_data, keys, schema = writers.load_features(fname)
+            self.pairs = PairTable({c['name']: keys[:, i] for i, c in enumerate(schema['keys']['columns'])})
+            return
+
+        self.pairs = PairTable.from_frame(readers.read_pairs(fname, self.required_cols()))
 
         sim_measures.LGMSimVars().load_freq_terms(encoding)
 
@@ -76,6 +91,14 @@ class Features:
         """Build features depending on the assignment of parameter :py:attr:`~poi_interlinking.config.MLConf.classification_method`
         and return values (fX, y) as ndarray of floats.
 
+        When :attr:`~poi_interlinking.config.use_feature_cache` is enabled, features that were previously built on the
+        same dataset and feature configuration are loaded from :class:`~poi_interlinking.misc.cache.FeatureCache`
+        instead.
+
+        When :attr:`~poi_interlinking.config.profile_features` is enabled, the wall time, number of calls and sampled
+        allocations of each stage, e.g., of each similarity metric, are recorded in
+        :data:`~poi_interlinking.misc.profiling.profiler`.
+
         Returns
         -------
         fX: ndarray
@@ -83,83 +106,231 @@ class Features:
         y: ndarray
             Binary labels {True, False} to train the classifiers.
         """
+        if not config.profile_features: return self._cached_build()
+
+        profiler.start(config.profile_alloc_sample_rate)
+        try:
+            with profiler.stage('build'):
+                return self._cached_build()
+        finally:
+            profiler.stop()
+
+    def _cached_build(self):
+        if not config.use_feature_cache: return self._build()
+
+        cache = FeatureCache()
+        key = cache.key(self.fname, sim_measures.LGMSimVars.freq_files, self.encoding, self.clf_method)
+        cached = cache.load(key)
+        if cached is not None: return cached
+
+        fX, y = self._build()
+        cache.save(key, fX, y)
+
+        return fX, y
+
+    def _build(self):
         # y = self.data_df[config.use_cols['status']].str.upper().map(self.d).values
-        y = self.data_df[config.use_cols['status']].to_numpy()
+        y = self.pairs.values(config.use_cols['status'])
+
+        df = self.pairs.to_frame()
+        if config.use_feature_store:
+            store = FeatureStore(feature_version(sim_measures.LGMSimVars.freq_files, self.encoding, self.clf_method))
+            fX = store.get_or_compute(df, self._compute_raw_features)
+        else:
+            fX = self._compute_raw_features(df)
+
+        selected = self._selected_mask()
+
+        # normalize values of street numbers and spatial features
+        scaled = self.scaled_cols()
+        if scaled: fX[:, scaled] = preprocessing.MinMaxScaler().fit_transform(fX[:, scaled])
+
+        if selected is not None: fX = fX[:, selected]
+        fX = helpers.to_feature_dtype(fX)
+        print(f'{fX.shape[1]} features are build as {fX.dtype}')
+
+        return fX, y
+
+    def _compute_raw_features(self, df):
+        """Compute the features, not normalized yet, of every pair in ``df``.
+
+        The features that are not selected in :attr:`~poi_interlinking.config.MLConf.selected_features` are assigned
+        NaN values.
+        """
+        selected = self._selected_mask()
+        street_cols = len(StaticValues.address_feature_cols)
+        n = len(df.index)
+
+        # groups with no selected features are not computed, as their columns may not be loaded either
+        if selected is None or selected[:street_cols].any():
+            self._log('Extracting street numbers from addresses...')
+            with profiler.stage('address split'):
+                str_name1, str_name2 = self._split_address(df)
+
+            self._log('Compute arithmetic features...')
+            with profiler.stage('arithmetic'):
+                fX0 = self.arithmetic_features(
+                    *self._street_numbers(df[config.use_cols['addr1']]),
+                    *self._street_numbers(df[config.use_cols['addr2']]))
+            with profiler.stage('street basic group'):
+                fX2 = self._compute_distinct(
+                    partial(self._compute_basic_features, selected=self._group_mask(selected, 'street')),
+                    str_name1, str_name2, self.verbose)
+        else:
+            fX0, fX2 = np.full(n, np.nan), np.full((n, street_cols - 1), np.nan)
+
+        if selected is None or selected[street_cols:-1].any():
+            self._log(f'Computing features of the {self.clf_method.lower()} group...')
+            with profiler.stage('name group'):
+                fX1 = self._compute_distinct(
+                    partial(self._name_features_func(), selected=self._group_mask(selected, 'name')),
+                    df[config.use_cols['s1']], df[config.use_cols['s2']], self.verbose)
+        else:
+            fX1 = np.full((n, len(selected) - street_cols - 1), np.nan)
+
+        if selected is None or selected[-1]:
+            with profiler.stage('spatial'):
+                fX3 = self._spatial_features(df)
+        else:
+            fX3 = np.full((n, 1), np.nan)
+
+        return np.concatenate((fX0[:, np.newaxis], fX2, fX1, fX3), axis=1)
+
+    def required_cols(self):
+        """Return the keys of :attr:`~poi_interlinking.config.use_cols` that are required to build the features
+        selected in :attr:`~poi_interlinking.config.MLConf.selected_features`.
+        """
+        selected = self._selected_mask()
+        if selected is None: selected = np.ones(len(self.feature_cols()), dtype=bool)
+        street_cols = len(StaticValues.address_feature_cols)
 
-        print('Extracting street numbers from addresses...')
-        self.data_df = self.data_df.progress_apply(self._split_address, axis=1)
+        keys = ['index', 'status']
+        if config.use_feature_store: keys += ['ID1', 'ID2']
+        if selected[:street_cols].any(): keys += ['addr1', 'addr2']
+        if selected[street_cols:-1].any(): keys += ['s1', 's2']
+        if selected[-1]: keys += ['lon1', 'lat1', 'lon2', 'lat2']
 
-        print('Compute arithmetic features...')
-        fX0 = self.data_df.progress_apply(
-            lambda x: self.arithmetic_features(x['str_no1'], x['str_no2']), axis=1).to_numpy()
-        fX2 = np.asarray(list(tqdm(
-            map(self._compute_basic_features, self.data_df['str_name1'], self.data_df['str_name2']),
-            total=len(self.data_df.index)
-        )), dtype=float)
+        return [k for k in config.use_cols if k in keys]
 
-        print(f'Computing features of the {self.clf_method.lower()} group...')
+    def _name_features_func(self):
         if self.clf_method.lower() == 'basic':
-            fX1 = np.asarray(list(tqdm(
-                map(self._compute_basic_features,
-                    self.data_df[config.use_cols['s1']],
-                    self.data_df[config.use_cols['s2']]),
-                total=len(self.data_df.index)
-            )), dtype=float)
+            return self._compute_basic_features
             # fX2 = np.asarray(list(tqdm(
             #     map(self._compute_basic_features, self.data_df['str_name1'], self.data_df['str_name2']),
             #     total=len(self.data_df.index)
             # )), dtype=float)
         elif self.clf_method.lower() == 'basic_sorted':
-            fX1 = list(tqdm(
-                map(self._compute_sorted_features,
-                    self.data_df[config.use_cols['s1']],
-                    self.data_df[config.use_cols['s2']]),
-                total=len(self.data_df.index)
-            ))
+            return self._compute_sorted_features
             # fX2 = list(tqdm(
             #     map(self._compute_sorted_features, self.data_df['str_name1'], self.data_df['str_name2']),
             #     total=len(self.data_df.index)
             # ))
         else:  # lgm
-            fX1 = list(tqdm(
-                map(self.compute_features, self.data_df[config.use_cols['s1']], self.data_df[config.use_cols['s2']]),
-                total=len(self.data_df.index)
-            ))
+            return self.compute_features
             # fX2 = list(tqdm(
             #     map(self.compute_features, self.data_df['str_name1'], self.data_df['str_name2']),
             #     total=len(self.data_df.index)
             # ))
 
-        if all(x in config.use_cols.values() for x in ['lon1', 'lat1', 'lon2', 'lat2']):
+    def _log(self, msg):
+        if self.verbose: print(msg)
+
+    def _spatial_features(self, df):
+        if all(x in config.use_cols for x in ['lon1', 'lat1', 'lon2', 'lat2']):
             # spatial features
-            print('Computing spatial features...')
-            print('Changing projection of coordinates to epsg:3857...')
+            self._log('Computing spatial features...')
+            coords = [
+                pd.to_numeric(df[config.use_cols[c]], errors='coerce').to_numpy(dtype=float)
+                for c in ['lon1', 'lat1', 'lon2', 'lat2']
+            ]
+
+            if config.distance_method == 'haversine':
+                return get_haversine_distance(*coords)[:, np.newaxis]
+
+            self._log('Changing projection of coordinates to epsg:3857...')
             proj = Projection()
-            self.data_df['p1'] = self.data_df.progress_apply(
-                lambda x: proj.change_projection(x[config.use_cols['lon1']], x[config.use_cols['lat1']]), axis=1)
-            self.data_df['p2'] = self.data_df.progress_apply(
-                lambda x: proj.change_projection(x[config.use_cols['lon2']], x[config.use_cols['lat2']]), axis=1)
-
-            fX3 = np.asarray(list(tqdm(
-                    map(get_distance,
-                        self.data_df['p1'],
-                        self.data_df['p2']),
-                    total=len(self.data_df.index)
-                )), dtype=float)
-        else:
-            print('Coords are not provided')
-            fX3 = np.zeros(fX0[:, np.newaxis].shape)
+            with profiler.stage('projection'):
+                x1, y1 = proj.change_projection(*coords[:2], self.verbose)
+                x2, y2 = proj.change_projection(*coords[2:], self.verbose)
+            return get_distance(x1, y1, x2, y2)[:, np.newaxis]
 
-        # normalize values
-        fX0 = preprocessing.MinMaxScaler().fit_transform(fX0[:, np.newaxis])
-        fX3 = preprocessing.MinMaxScaler().fit_transform(fX3)
+        self._log('Coords are not provided')
+        return np.zeros((len(df.index), 1))
 
-        fX = np.concatenate((fX0, fX2, fX1, fX3), axis=1)
-        print(f'{fX.shape[1]} features are build')
+    def feature_cols(self):
+        """Return the names of all the features that are built for the assigned classification group, regardless of
+        :attr:`~poi_interlinking.config.MLConf.selected_features`.
+        """
+        return [
+            c for c in StaticValues(self.clf_method, selected_only=False).final_cols
+            if c not in StaticValues.extra_feature_cols
+        ]
 
-        return fX, y
+    def _selected_mask(self):
+        if self.selected_features is None: return None
 
-    def compute_features(self, s1, s2, sorted=True, lgm_sims=True):
+        cols = self.feature_cols()
+        unknown = set(self.selected_features) - set(cols)
+        assert not unknown, f'Selected features {unknown} are not built for the {self.clf_method} group'
+
+        return np.isin(cols, self.selected_features)
+
+    def scaled_cols(self):
+        """Return the positions, among :meth:`feature_cols`, of the selected features that are min-max normalized,
+        i.e., the street numbers and spatial ones.
+        """
+        selected = self._selected_mask()
+        return [c for c in [0, -1] if selected is None or selected[c]]
+
+    @staticmethod
+    def _group_mask(selected, group):
+        """Slice the mask of the selected features to the ones computed on street names or names respectively."""
+        if selected is None: return None
+
+        street_cols = len(StaticValues.address_feature_cols)
+        return selected[1:street_cols] if group == 'street' else selected[street_cols:-1]
+
+    def feature_costs(self, sample_size=1000):
+        """Measure the compute cost of each feature on a sample of the loaded dataset.
+
+        Parameters
+        ----------
+        sample_size: int
+            The number of pairs to use for measuring the costs.
+
+        Returns
+        -------
+        ndarray of float
+            The average time, in seconds, that each feature in :meth:`feature_cols` requires per pair.
+        """
+        sample = self.pairs.take(np.random.RandomState(config.seed_no).choice(
+            len(self.pairs), min(sample_size, len(self.pairs)), replace=False)).to_frame()
+        str_names = self._split_address(sample)
+        names = [sample[config.use_cols[s]] for s in ['s1', 's2']]
+
+        costs = []
+
+        start_time = time.time()
+        self.arithmetic_features(*self._street_numbers(sample[config.use_cols['addr1']]),
+                                 *self._street_numbers(sample[config.use_cols['addr2']]))
+        costs.append(time.time() - start_time)
+
+        all_cols = np.ones(len(self.feature_cols()), dtype=bool)
+        for func, (s1, s2), group in [
+            (self._compute_basic_features, str_names, 'street'), (self._name_features_func(), names, 'name')
+        ]:
+            for selected in np.eye(np.count_nonzero(self._group_mask(all_cols, group)), dtype=bool):
+                start_time = time.time()
+                for a, b in zip(s1, s2): func(a, b, selected=selected)
+                costs.append(time.time() - start_time)
+
+        start_time = time.time()
+        self._spatial_features(sample)
+        costs.append(time.time() - start_time)
+
+        return np.asarray(costs) / len(sample.index)
+
+    def compute_features(self, s1, s2, sorted=True, lgm_sims=True, mirrored=None, selected=None):
         """
         Depending on the group assigned to parameter :py:attr:`~poi_interlinking.config.MLConf.classification_method`,
         this method builds an ndarray of the following groups of features:
@@ -190,6 +361,12 @@ class Features:
             Value of True indicate to build features for groups *basic* and *basic_sorted*, value of False only for *basic* group.
         lgm_sims: bool, optional
             Values of True or False indicate whether to build or not features for group *lgm*.
+        mirrored: :obj:`list`, optional
+            The features already computed for the mirrored pair, i.e., (s2, s1). The values of metrics listed in
+            :attr:`~poi_interlinking.helpers.StaticValues.symmetric_metrics` are reused instead of being recomputed.
+        selected: array-like of bool, optional
+            Indicates which of the features to compute. The ones that are not selected are assigned NaN without
+            calling their metric. All the features are computed by default.
 
         Returns
         -------
@@ -199,41 +376,126 @@ class Features:
         f = []
         for status in list({False, sorted}):
             sim_group = 'basic' if status is False else 'sorted'
+            group_size = sum(sim_group in val for val in StaticValues.sim_metrics.values())
+            if selected is not None and not any(selected[len(f):len(f) + group_size]):
+                f.extend([np.nan] * group_size)
+                continue
 
-            a, b = transform(s1, s2, sorting=status, canonical=status)
+            with profiler.stage('transform'):
+                a, b = transform(s1, s2, sorting=status, canonical=status)
+            identical = self._is_identical(a, b)
 
             for sim, val in StaticValues.sim_metrics.items():
                 if sim_group in val:
-                    if '_reversed' in sim:
-                        f.append(getattr(sim_measures, sim[:-len('_reversed')])(a[::-1], b[::-1]))
+                    if selected is not None and not selected[len(f)]:
+                        f.append(np.nan)
+                    elif identical:
+                        f.append(1.0)
+                    elif mirrored is not None and sim in StaticValues.symmetric_metrics:
+                        f.append(mirrored[len(f)])
                     else:
-                        f.append(getattr(sim_measures, sim)(a, b))
+                        with profiler.stage(f'{sim_group} {sim}'):
+                            if '_reversed' in sim:
+                                f.append(getattr(sim_measures, sim[:-len('_reversed')])(a[::-1], b[::-1]))
+                            else:
+                                f.append(getattr(sim_measures, sim)(a, b))
 
         if lgm_sims:
             sim_group = 'lgm'
-            a, b = transform(s1, s2, sorting=True, canonical=True)
+            group_size = sum(sim_group in val for val in StaticValues.sim_metrics.values())
+            base_scores_size = len(StaticValues.individual_lgm_feature_cols)
+            if selected is not None and not any(selected[len(f):len(f) + group_size + base_scores_size]):
+                f.extend([np.nan] * (group_size + base_scores_size))
+                return f
+
+            with profiler.stage('transform'):
+                a, b = transform(s1, s2, sorting=True, canonical=True)
+            identical = self._is_identical(a, b)
 
             for sim, val in StaticValues.sim_metrics.items():
                 if sim_group in val:
-                    if '_reversed' in sim:
-                        f.append(self._compute_lgm_sim(a[::-1], b[::-1], sim[:-len('_reversed')]))
+                    if selected is not None and not selected[len(f)]:
+                        f.append(np.nan)
+                    elif identical:
+                        f.append(1.0)
+                    elif mirrored is not None and sim in StaticValues.symmetric_metrics:
+                        f.append(mirrored[len(f)])
                     else:
-                        f.append(self._compute_lgm_sim(a, b, sim))
-
-            f.extend(list(self._compute_lgm_sim_base_scores(a, b, 'damerau_levenshtein')))
+                        with profiler.stage(f'{sim_group} {sim}'):
+                            if '_reversed' in sim:
+                                f.append(self._compute_lgm_sim(a[::-1], b[::-1], sim[:-len('_reversed')]))
+                            else:
+                                f.append(self._compute_lgm_sim(a, b, sim))
+
+            # the individual scores per list of terms are not 1.0 for identical toponyms, e.g., no mismatch terms
+            if selected is not None and not any(selected[len(f):len(f) + base_scores_size]):
+                f.extend([np.nan] * base_scores_size)
+            elif mirrored is not None:
+                f.extend(mirrored[len(f):len(f) + base_scores_size])
+            else:
+                with profiler.stage('lgm base scores'):
+                    f.extend(list(self._compute_lgm_sim_base_scores(a, b, 'damerau_levenshtein')))
 
         return f
 
-    def _compute_sorted_features(self, s1, s2):
-        return self.compute_features(s1, s2, True, False)
+    @staticmethod
+    def _is_identical(a, b):
+        # all similarity metrics score 1.0 on identical strings unless they contain empty or abbreviation-only tokens
+        tokens = a.replace('-', ' ').split(' ')
+        return a == b and '' not in tokens and '.' not in tokens
+
+    def _compute_sorted_features(self, s1, s2, mirrored=None, selected=None):
+        return self.compute_features(s1, s2, True, False, mirrored, selected)
+
+    def _compute_basic_features(self, s1, s2, mirrored=None, selected=None):
+        return self.compute_features(s1, s2, False, False, mirrored, selected)
+
+    @staticmethod
+    def _compute_distinct(func, s1, s2, verbose=True):
+        """Compute the features of each distinct pair of ``s1``, ``s2`` values once and scatter them back to the rows.
+
+        A pair whose mirrored one, i.e., (s2, s1), is already computed reuses the values of the symmetric metrics.
+
+        Parameters
+        ----------
+        func: callable
+            The method that computes the features of a pair, e.g., :meth:`compute_features`.
+        s1, s2: :obj:`pandas.Series` of str
+            The input toponyms.
+        verbose: bool
+            Whether to show a progress bar and print the number of distinct pairs.
+
+        Returns
+        -------
+        ndarray
+            The computed features per row.
+        """
+        # codes of the distinct pairs in order of their first occurrence
+        distinct = dict()
+        codes = np.fromiter(
+            (distinct.setdefault(pair, len(distinct)) for pair in zip(s1, s2)), dtype=np.intp, count=len(s1))
+
+        computed = dict()
+        fX = []
+        mirrored_no = 0
+        for a, b in tqdm(distinct, total=len(distinct), disable=not verbose):
+            mirrored = computed.get((b, a))
+            if mirrored is not None: mirrored_no += 1
 
-    def _compute_basic_features(self, s1, s2):
-        return self.compute_features(s1, s2, False, False)
+            fX.append(func(a, b, mirrored=mirrored))
+            computed[(a, b)] = fX[-1]
+
+        if verbose:
+            print(f'Computed features on {len(distinct)} distinct pairs out of {len(codes)} '
+                  f'({len(distinct) / max(len(codes), 1):.2%}), {mirrored_no} of which are mirrored.')
+
+        return np.asarray(fX, dtype=float)[codes]
 
     @staticmethod
     def _compute_lgm_sim(s1, s2, metric, w_type='avg'):
-        baseTerms, mismatchTerms, specialTerms = sim_measures.lgm_sim_split(
-            s1, s2, sim_measures.LGMSimVars.per_metric_optValues[metric][w_type][0])
+        with profiler.stage('lgm split'):
+            baseTerms, mismatchTerms, specialTerms = sim_measures.lgm_sim_split(
+                s1, s2, sim_measures.LGMSimVars.per_metric_optValues[metric][w_type][0])
 
         # if metric in ['jaro_winkler_r', 'tuned_jaro_winkler_r']:
         #     return sim_measures.weighted_sim(
@@ -251,28 +513,103 @@ class Features:
 
     @staticmethod
     def _compute_lgm_sim_base_scores(s1, s2, metric, w_type='avg'):
-        base_t, mis_t, special_t = sim_measures.lgm_sim_split(
-            s1, s2, sim_measures.LGMSimVars.per_metric_optValues[metric][w_type][0])
+        with profiler.stage('lgm split'):
+            base_t, mis_t, special_t = sim_measures.lgm_sim_split(
+                s1, s2, sim_measures.LGMSimVars.per_metric_optValues[metric][w_type][0])
         return sim_measures.score_per_term(base_t, mis_t, special_t, metric)
 
-    def _split_address(self, row):
-        for s in ['1', '2']:
-            row[f'str_name{s}'] = re.sub(no_match, '', row[f'{config.use_cols["addr" + s]}']).strip()
-            row[f'str_no{s}'] = list(filter(lambda value: (len(value) != self.zip_thres_len),
-                                            set(re.findall(r'\b\d+', row[f'{config.use_cols["addr" + s]}']))))
+    @staticmethod
+    def _split_address(df):
+        """Return the street names of ``df`` addresses, i.e., without the street numbers."""
+        return tuple(
+            df[config.use_cols[f'addr{s}']].str.replace(no_match, '', regex=True).str.strip() for s in ['1', '2'])
+
+    def _street_numbers(self, addr):
+        """Extract the distinct street numbers of the ``addr`` values, excluding the ones with length equal to
+        :attr:`zip_thres_len` that are considered zip codes, into a padded array.
 
-        return row
+        Parameters
+        ----------
+        addr: :obj:`pandas.Series` of str
+            The addresses.
+
+        Returns
+        -------
+        nos: ndarray of int, shape = [n_samples, max_numbers]
+            The street numbers found per address, zero padded.
+        mask: ndarray of bool, shape = [n_samples, max_numbers]
+            Indicates the valid entries of ``nos``. Addresses with no street numbers are assigned a single 0 value.
+        """
+        # a plain loop over the values costs less than the per call overhead of pandas string methods on small batches
+        rows, pos, found = [], [], []
+        for i, a in enumerate(addr):
+            distinct = dict.fromkeys(n for n in no_digits.findall(a) if len(n) != self.zip_thres_len)
+            rows.extend([i] * len(distinct))
+            pos.extend(range(len(distinct)))
+            found.extend(map(int, distinct))
+
+        pos = np.asarray(pos, dtype=np.intp)
+        nos = np.zeros((len(addr), pos.max() + 1 if pos.size else 1), dtype=np.int64)
+        mask = np.zeros(nos.shape, dtype=bool)
+        nos[rows, pos] = found
+        mask[rows, pos] = True
+        # default value 0 when no street number is found
+        mask[:, 0] |= ~mask.any(axis=1)
+
+        return nos, mask
 
     @staticmethod
-    def arithmetic_features(no1, no2):
-        # lno1 = map(int, no1.split(',')) if no1 else [0]
-        lno1 = map(int, no1) if len(no1) else [0]
-        lno2 = map(int, no2) if len(no2) else [0]
+    def arithmetic_features(no1, mask1, no2, mask2):
+        """Compute the minimum absolute difference among all pairs of street numbers per row.
+
+        Parameters
+        ----------
+        no1, no2: ndarray of int, shape = [n_samples, max_numbers]
+            Padded street numbers as returned by :meth:`_street_numbers`.
+        mask1, mask2: ndarray of bool, shape = [n_samples, max_numbers]
+            The valid entries of ``no1`` and ``no2`` respectively.
+
+        Returns
+        -------
+        ndarray of int, shape = [n_samples]
+            The minimum difference of street numbers per row.
+        """
+        diffs = np.abs(no1[:, :, np.newaxis] - no2[:, np.newaxis, :])
+        valid = mask1[:, :, np.newaxis] & mask2[:, np.newaxis, :]
+
+        return np.where(valid, diffs, np.iinfo(diffs.dtype).max).min(axis=(1, 2))
 
-        return min([abs(a - b) for a in lno1 for b in lno2])
+    def get_built_features(self):
+        """Return the features and labels of a loaded dataset that contains already built features.
+
+        Datasets stored by :func:`~poi_interlinking.misc.writers.save_features` are not copied, i.e., the returned
+        features are the memory-mapped file in its stored dtype.
+
+        Returns
+        -------
+        fX: ndarray
+            The pre-built features.
+        y: ndarray
+            The labels of the dataset.
+        """
+        if self.built_data is not None:
+            assert self.pairs.columns == [config.use_cols['index'], config.use_cols['status']], \
+                f'{self.fname} does not follow the layout of stored features'
+            return self.built_data, self.pairs.values(config.use_cols['status'])
+
+        y = self.pairs.values(config.use_cols['status'])
+        fX = np.column_stack([
+            self.pairs.values(c) for c in self.pairs.columns
+            if c not in [config.use_cols['status'], config.use_cols['index']]
+        ])
+
+        return fX, y
 
     def get_loaded_data(self):
-        return self.data_df.copy()
+        """Return the loaded dataset as a read-only :class:`~poi_interlinking.processing.pairs.PairTable`, which is
+        not copied; use its :meth:`~poi_interlinking.processing.pairs.PairTable.take` to get the rows of a fold.
+        """
+        return self.pairs
 
     def get_index_col(self):
-        return self.data_df[config.use_cols['index']].to_numpy()
+        return self.pairs.values(config.use_cols['index'])
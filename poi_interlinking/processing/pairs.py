@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+
+class PairTable:
+    """A read-only, array-backed table of POI pairs.
+
+    String columns are interned, i.e., stored as integer codes into their distinct values, and the rest of the columns
+    as numeric arrays. Slicing returns views and taking rows by index copies only the codes and numbers, whereas the
+    distinct values are shared. Thus, the folds of a dataset do not duplicate its strings.
+
+    Parameters
+    ----------
+    columns: dict
+        Maps each column name to either an ndarray of numbers or a tuple of (codes, uniques) for interned strings.
+    """
+    def __init__(self, columns):
+        self._columns = dict()
+        for name, col in columns.items():
+            if isinstance(col, tuple):
+                codes, uniques = col
+                self._columns[name] = (self._read_only(codes), uniques)
+            else:
+                self._columns[name] = self._read_only(col)
+
+        lengths = {len(self.codes(c)) if self.is_interned(c) else len(self._columns[c]) for c in self._columns}
+        assert len(lengths) <= 1, f'Columns of a pair table should have equal lengths, found {lengths}'
+        self._len = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build a table from a :obj:`pandas.DataFrame`, interning its non numeric columns."""
+        columns = dict()
+        for c in df.columns:
+            if pd.api.types.is_numeric_dtype(df[c].dtype) or pd.api.types.is_bool_dtype(df[c].dtype):
+                columns[c] = df[c].to_numpy()
+            else:
+                if isinstance(df[c].dtype, pd.CategoricalDtype):
+                    # already interned
+                    codes, uniques = df[c].cat.codes.to_numpy(), df[c].cat.categories
+                else:
+                    codes, uniques = pd.factorize(df[c])
+                columns[c] = (codes.astype(np.int32 if len(uniques) < 2 ** 31 else np.int64), pd.Index(uniques))
+
+        return cls(columns)
+
+    @staticmethod
+    def _read_only(a):
+        a = np.asarray(a)
+        if a.flags.writeable:
+            a = a.view()
+            a.flags.writeable = False
+        return a
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def is_interned(self, name):
+        return isinstance(self._columns[name], tuple)
+
+    def codes(self, name):
+        """Return the integer codes of the interned column ``name``."""
+        return self._columns[name][0]
+
+    def uniques(self, name):
+        """Return the distinct values of the interned column ``name``."""
+        return self._columns[name][1]
+
+    def values(self, name):
+        """Return the values of column ``name``, i.e., a read-only array for numeric columns or a categorical, backed
+        by the codes and distinct values, for interned ones.
+        """
+        col = self._columns[name]
+        if not isinstance(col, tuple): return col
+
+        return pd.Categorical.from_codes(col[0], categories=col[1])
+
+    def __getitem__(self, name):
+        """Return column ``name`` as a :obj:`pandas.Series` that does not copy the underlying arrays."""
+        return pd.Series(self.values(name), name=name, copy=False)
+
+    def _map(self, func):
+        return PairTable({
+            c: (func(col[0]), col[1]) if isinstance(col, tuple) else func(col) for c, col in self._columns.items()
+        })
+
+    def slice(self, start=None, stop=None):
+        """Return the rows in [start, stop) as a table of views."""
+        return self._map(lambda a: a[start:stop])
+
+    def take(self, idxs):
+        """Return the rows at positions ``idxs``. Only the codes and numbers of the selected rows are copied."""
+        return self._map(lambda a: a[idxs])
+
+    def to_frame(self, columns=None):
+        """Return the table, or the given ``columns`` of it, as a :obj:`pandas.DataFrame` with categorical columns for
+        the interned ones.
+        """
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({c: self[c] for c in columns}, copy=False)
+
+    @property
+    def nbytes(self):
+        """The memory, in bytes, of codes and numbers, excluding the distinct values of interned columns."""
+        return sum(col[0].nbytes if isinstance(col, tuple) else col.nbytes for col in self._columns.values())
@@ -792,6 +792,7 @@ def tuned_jaro_winkler(s1, s2, long_tolerance=False):
 
 class LGMSimVars:
     freq_ngrams = {'tokens': set(), 'chars': set()}
+    freq_files = []
     weights = []
     per_metric_optValues = {}
 
@@ -799,11 +800,13 @@ class LGMSimVars:
         print("Resetting any previously assigned frequent terms ...")
         self.freq_ngrams['tokens'].clear()
         self.freq_ngrams['chars'].clear()
+        del self.freq_files[:]
 
         for f in glob.iglob(os.path.join(config.default_data_path, f'*gram*_{encoding}.csv')):
             gram_type = 'tokens' if 'token' in os.path.basename(os.path.normpath(f)) else 'chars'
 
             print("Loading frequent terms from file {} ...".format(f))
+            self.freq_files.append(f)
             df = pd.read_csv(f, sep='\t', header=0, names=['term', 'no'], nrows=config.freq_term_size)
             self.freq_ngrams[gram_type].update(
                 pd.concat([df['term'], df['term'].apply(lambda x: x[::-1])]).tolist())
@@ -1,11 +1,15 @@
 from ast import literal_eval
+import numpy as np
 import pandas as pd
-from shapely.geometry import shape, Point
-from shapely.ops import transform
+from shapely.geometry import shape
 from rtree import index
 import pyproj
 
 
+#: float: The mean radius of earth in meters used by :func:`get_haversine_distance`.
+earth_radius = 6371008.8
+
+
 def create_index(poly_gdf):
     idx = index.Index()
     for poly in poly_gdf.itertuples():
@@ -130,29 +134,53 @@ def get_poi_poly_matches(poi_gdf, poly_gdf, idx, strategy):
     # ]
 
 
-def get_distance(p1, p2):
-    """It finds the minimum distance between two Points
+def get_distance(x1, y1, x2, y2, max_dist=5000):
+    """It finds the euclidean distance between two arrays of projected points.
 
     Parameters
     ----------
-    p1 : shapely geometric object
-        The first point
-    p2 : shapely geometric object
-        The second point
+    x1, y1 : ndarray of float
+        The coordinates of the first points.
+    x2, y2 : ndarray of float
+        The coordinates of the second points.
+    max_dist : float
+        The upper bound of the returned distances. Invalid distances are also assigned this value.
 
     Returns
     -------
-    list
-        Returns the minimum distance. The value follows the geometric object projection.
+    ndarray of float
+        Returns the distance per pair of points. The value follows the geometric object projection.
+    """
+    with np.errstate(invalid='ignore', over='ignore'):
+        dist = np.hypot(x2 - x1, y2 - y1)
+
+    return np.fmin(dist, max_dist)
 
+
+def get_haversine_distance(lon1, lat1, lon2, lat2, max_dist=5000):
+    """It finds the great-circle distance, in meters, between two arrays of unprojected points.
+
+    Parameters
+    ----------
+    lon1, lat1 : ndarray of float
+        The longitude and latitude, in degrees, of the first points.
+    lon2, lat2 : ndarray of float
+        The longitude and latitude, in degrees, of the second points.
+    max_dist : float
+        The upper bound of the returned distances. Invalid distances are also assigned this value.
+
+    Returns
+    -------
+    ndarray of float
+        Returns the distance per pair of points.
     """
-    dist = 5000
-    try:
-        dist = min(dist, p1.distance(p2))
-    except TypeError as err:
-        print(f'{err}')
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+
+    with np.errstate(invalid='ignore'):
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        dist = 2 * earth_radius * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
 
-    return [dist]
+    return np.fmin(dist, max_dist)
 
 
 class Projection:
@@ -171,24 +199,29 @@ class Projection:
             pyproj.Proj(f'epsg:{src}'),  # source coordinate system
             pyproj.Proj(f'epsg:{dest}'))  # destination coordinate system
 
-    def change_projection(self, lon, lat):
-        """Transforms the coordinates of a geometric object to the new projection.
+    def change_projection(self, lon, lat, verbose=True):
+        """Transforms the coordinates of an array of points to the new projection with a single call.
 
         Parameters
         ----------
-        lon : float
-            The longitude of the geometric Point.
-        lat : float
-            The latitude of the geometric Point.
+        lon : ndarray of float
+            The longitudes of the points.
+        lat : ndarray of float
+            The latitudes of the points.
+        verbose : bool
+            Whether to print the number of points with missing coordinates.
 
         Returns
         -------
-            A shapely Point on the new projection.
+        x, y : ndarray of float
+            The coordinates of the points on the new projection. Points with missing coordinates are assigned the
+            (0, 0) point.
         """
-        p = Point(0, 0)
-        try:
-            p = transform(self.project.transform, Point(lon, lat))
-        except TypeError as err:
-            print(f'{err} for ({lon}, {lat})')
+        valid = ~(np.isnan(lon) | np.isnan(lat))
+        if verbose and not valid.all():
+            print(f'{np.count_nonzero(~valid)} points with invalid coordinates')
+
+        x, y = np.zeros(lon.shape), np.zeros(lat.shape)
+        x[valid], y[valid] = self.project.transform(lon[valid], lat[valid])
 
-        return p
+        return x, y
@@ -0,0 +1,206 @@
+import os
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn import preprocessing
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline
+from sklearn.utils.validation import check_is_fitted
+
+from poi_interlinking import config, helpers
+from poi_interlinking.processing import sim_measures
+from poi_interlinking.processing.features import Features
+from poi_interlinking.processing.pairs import PairTable
+
+
+# settings read while computing features, which are passed on to worker processes
+_config_settings = ['use_cols', 'sort_thres', 'distance_method']
+
+
+class PairFeatures(TransformerMixin, BaseEstimator):
+    """A scikit-learn transformer that builds the features of POI pairs, so that feature extraction can be a step of
+    a :class:`sklearn.pipeline.Pipeline`.
+
+    It takes a :obj:`pandas.DataFrame`, or :class:`~poi_interlinking.processing.pairs.PairTable`, of pairs with the
+    columns of :attr:`~poi_interlinking.config.use_cols`. :meth:`fit` loads the frequent terms and learns the min-max
+    scaling of the street number and spatial features, which :meth:`transform` then applies to unseen pairs, i.e.,
+    unlike :meth:`Features.build <poi_interlinking.processing.features.Features.build>` that scales each dataset on its
+    own values.
+
+    Parameters
+    ----------
+    clf_method: str, optional
+        The classification group of features (*basic* | *basic_sorted* | *lgm*). Defaults to
+        :attr:`~poi_interlinking.config.MLConf.classification_method`.
+    encoding: str
+        The encoding of the frequent terms and LGM-Sim parameters to use, see
+        :attr:`~poi_interlinking.config.MLConf.sim_opt_params`.
+    selected_features: list of str, optional
+        The features to build. Defaults to :attr:`~poi_interlinking.config.MLConf.selected_features`.
+    dtype: str, optional
+        The dtype of the output features. Defaults to :attr:`~poi_interlinking.config.feature_dtype`.
+    n_jobs: int, optional
+        Number of processes that compute the features of chunks of pairs in parallel. None means 1.
+    chunk_size: int, optional
+        Maximum number of pairs per chunk. Defaults to splitting the pairs evenly among the ``n_jobs`` processes.
+    verbose: bool
+        Whether building the features prints the progress of its stages, see
+        :attr:`Features.verbose <poi_interlinking.processing.features.Features.verbose>`.
+    """
+    def __init__(self, clf_method=None, encoding='latin', selected_features=None, dtype=None, n_jobs=None,
+                 chunk_size=None, verbose=True):
+        self.clf_method = clf_method
+        self.encoding = encoding
+        self.selected_features = selected_features
+        self.dtype = dtype
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+        self.verbose = verbose
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        # transformers stored before verbose was a parameter print their progress
+        self.__dict__.setdefault('verbose', True)
+
+    def fit(self, X, y=None):
+        """Learn the scaling of the features of pairs ``X``. Only the scaled features, i.e., street numbers and
+        spatial ones that are cheap to compute, are built.
+
+        Parameters
+        ----------
+        X: :obj:`pandas.DataFrame` or :class:`~poi_interlinking.processing.pairs.PairTable`
+            The POI pairs.
+        y: ignored
+
+        Returns
+        -------
+        self
+        """
+        self._fit(X, scaled_only=True)
+        return self
+
+    def fit_transform(self, X, y=None, **fit_params):
+        """Learn the scaling of the features of pairs ``X`` and return them scaled, computing them once."""
+        return self._finalize(self._fit(X))
+
+    def transform(self, X):
+        """Build the features of pairs ``X``.
+
+        Parameters
+        ----------
+        X: :obj:`pandas.DataFrame` or :class:`~poi_interlinking.processing.pairs.PairTable`
+            The POI pairs.
+
+        Returns
+        -------
+        ndarray, shape = [n_samples, n_features]
+            The selected features, scaled as learned in :meth:`fit`, in the output ``dtype``.
+        """
+        check_is_fitted(self, 'state_')
+        return self._finalize(self._compute(X))
+
+    def get_feature_names_out(self, input_features=None):
+        """Return the names of the output features."""
+        features = self._features()
+        selected = features._selected_mask()
+        cols = np.asarray(features.feature_cols(), dtype=object)
+
+        return cols if selected is None else cols[selected]
+
+    def required_cols(self):
+        """Return the keys of :attr:`~poi_interlinking.config.use_cols` that are required to build the features,
+        i.e., the index and the inputs of the selected ones, but neither labels nor IDs.
+        """
+        return [k for k in self._features().required_cols() if k not in ['status', 'ID1', 'ID2']]
+
+    def _features(self):
+        features = Features()
+        if self.clf_method is not None: features.clf_method = self.clf_method
+        if self.selected_features is not None: features.selected_features = self.selected_features
+        return features
+
+    def _fit(self, X, scaled_only=False):
+        features = self._features()
+        self.scaled_cols_ = features.scaled_cols()
+
+        sim_measures.LGMSimVars().load_freq_terms(self.encoding)
+        self.state_ = dict(
+            clf_method=features.clf_method,
+            selected_features=features.selected_features,
+            freq_ngrams={k: frozenset(v) for k, v in sim_measures.LGMSimVars.freq_ngrams.items()},
+            per_metric_optValues=config.MLConf.sim_opt_params[self.encoding.lower()],
+            config={s: getattr(config, s) for s in _config_settings},
+        )
+
+        selected = np.asarray(features.feature_cols())[self.scaled_cols_].tolist() if scaled_only else None
+        fX = self._compute(X, selected)
+
+        self.scaler_ = preprocessing.MinMaxScaler().fit(fX[:, self.scaled_cols_]) if self.scaled_cols_ else None
+        self.n_features_out_ = len(self.get_feature_names_out())
+
+        return fX
+
+    def _compute(self, X, selected_features=None):
+        state = self.state_ if selected_features is None else dict(self.state_, selected_features=selected_features)
+        df = X.to_frame() if isinstance(X, PairTable) else X
+        n = len(df.index)
+
+        n_jobs = effective_n_jobs(self.n_jobs)
+        chunk_size = self.chunk_size or max(-(-n // n_jobs), 1)
+        chunks = [df.iloc[i:i + chunk_size] for i in range(0, n, chunk_size)]
+
+        if n_jobs == 1:
+            fX = [_raw_features(c, state, verbose=self.verbose) for c in chunks]
+        else:
+            fX = Parallel(n_jobs=n_jobs)(delayed(_raw_features)(c, state, True, self.verbose) for c in chunks)
+
+        return np.concatenate(fX) if fX else np.empty((0, len(self._features().feature_cols())))
+
+    def _finalize(self, fX):
+        if self.scaler_ is not None: fX[:, self.scaled_cols_] = self.scaler_.transform(fX[:, self.scaled_cols_])
+
+        selected = self._features()._selected_mask()
+        if selected is not None: fX = fX[:, selected]
+
+        return helpers.to_feature_dtype(fX, self.dtype)
+
+
+def _raw_features(df, state, worker=False, verbose=True):
+    """Compute the raw features of ``df`` with the frequent terms and settings of a fitted :class:`PairFeatures`.
+
+    Frequent terms and LGM-Sim parameters are class attributes of
+    :class:`~poi_interlinking.processing.sim_measures.LGMSimVars`, i.e., they are set per process, as are the settings
+    of ``config`` in ``worker`` processes.
+    """
+    if worker:
+        for s, v in state['config'].items(): setattr(config, s, v)
+    sim_measures.LGMSimVars.freq_ngrams = {k: set(v) for k, v in state['freq_ngrams'].items()}
+    sim_measures.LGMSimVars.per_metric_optValues = state['per_metric_optValues']
+
+    features = Features()
+    features.clf_method = state['clf_method']
+    features.selected_features = state['selected_features']
+    features.verbose = verbose
+
+    return features._compute_raw_features(df.reset_index(drop=True))
+
+
+def make_pipeline(estimator, memory=None, **params):
+    """Build a :class:`sklearn.pipeline.Pipeline` of a :class:`PairFeatures` step, named *features*, and
+    ``estimator``, named *clf*.
+
+    The fitted feature step is cached in ``memory``, so that tuning the estimator, e.g., with
+    :class:`~sklearn.model_selection.GridSearchCV`, builds the features of each train fold once.
+
+    Parameters
+    ----------
+    estimator: estimator
+        The classifier to train on the built features.
+    memory: str or :class:`joblib.Memory`, optional
+        Where to cache the fitted feature step. Defaults to the *pipeline* folder in
+        :attr:`~poi_interlinking.config.cache_path` if :attr:`~poi_interlinking.config.use_feature_cache` is enabled.
+    params:
+        Parameters of :class:`PairFeatures`.
+    """
+    if memory is None and config.use_feature_cache: memory = os.path.join(config.cache_path, 'pipeline')
+
+    return Pipeline([('features', PairFeatures(**params)), ('clf', estimator)], memory=memory)
@@ -0,0 +1,254 @@
+"""A long-running service that keeps a model bundle warm and scores POI pairs over HTTP, on TCP or a Unix socket."""
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from poi_interlinking import config
+from poi_interlinking.learning.bundle import ModelBundle
+from poi_interlinking.misc import readers
+
+
+class ScoringService:
+    """Scores POI pairs with a :class:`~poi_interlinking.learning.bundle.ModelBundle` that is loaded once.
+
+    Concurrent requests are collected into micro-batches of up to :attr:`max_batch_size` pairs, waiting at most
+    :attr:`max_wait` seconds for a batch to fill, so that features are built and scored per batch rather than per
+    request. Batches are scored one at a time in a worker thread, as the frequent terms are shared state, whereas the
+    event loop keeps accepting requests. Tree ensembles are scored by their compiled trees, if the bundle has them and
+    :attr:`~poi_interlinking.config.service_compiled_trees` is set.
+
+    The HTTP API, see :meth:`start`, consists of:
+
+    * ``POST /score``: a JSON list of pairs, or an object with a *pairs* list, where each pair has the columns of
+      :attr:`~poi_interlinking.config.use_cols` that the bundle requires. It returns the probability of each pair
+      to match, as *scores*, and its predicted class, as *pred*.
+    * ``GET /stats``: the latency percentiles, in milliseconds, of the recent requests, the mean batch size and, with
+      a cascade, the fraction of pairs escalated to all features.
+    * ``GET /health``.
+
+    Parameters
+    ----------
+    bundle: :class:`~poi_interlinking.learning.bundle.ModelBundle`
+        The bundle to score pairs with.
+    clf: str, optional
+        The classifier of the bundle to use. Defaults to its first one.
+    max_batch_size: int, optional
+        Defaults to :attr:`~poi_interlinking.config.service_max_batch_size`.
+    max_wait: float, optional
+        Defaults to :attr:`~poi_interlinking.config.service_max_wait`.
+    cascade: bool
+        Whether to score with the cascade of the bundle, see :class:`~poi_interlinking.learning.cascade.CascadeScorer`.
+    """
+    def __init__(self, bundle, clf=None, max_batch_size=None, max_wait=None, cascade=False):
+        self.bundle = bundle
+        self.clf = clf
+        self.cascade = cascade
+        self.max_batch_size = config.service_max_batch_size if max_batch_size is None else max_batch_size
+        self.max_wait = config.service_max_wait if max_wait is None else max_wait
+        self.keys = [k for k in bundle.features.required_cols() if k != 'index']
+        self.columns = [config.use_cols[k] for k in self.keys]
+
+        self.latencies = deque(maxlen=config.service_latency_window)
+        self.batch_sizes = deque(maxlen=config.service_latency_window)
+        self._queue = None
+        self._batcher = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+        # batches are small, i.e., the overhead of parallel prediction outweighs its gain
+        for model in bundle.models.values():
+            if hasattr(model, 'n_jobs'): model.set_params(n_jobs=1)
+        # the progress of building features is not printed per batch
+        bundle.features.set_params(verbose=False)
+        if bundle.cascade is not None: bundle.cascade.features_.set_params(verbose=False)
+
+        # the first batch pays for lazy imports and allocations
+        self._predict([{
+            config.use_cols[k]: 'warm up' if config.col_dtypes.get(k, 'str') == 'str' else 0 for k in self.keys
+        }])
+        if cascade: bundle.cascade.scored = bundle.cascade.escalated = 0
+
+    def _predict(self, records):
+        return self.bundle.predict_proba(
+            readers.pairs_from_records(records, self.keys), self.clf, compiled=config.service_compiled_trees,
+            cascade=self.cascade
+        )[:, 1]
+
+    def validate(self, pairs):
+        """Raise a :class:`ValueError` unless ``pairs`` is a list of dicts with the fields that the bundle requires,
+        whose numeric ones, e.g., coordinates, are numbers or null.
+        """
+        if not isinstance(pairs, list): raise ValueError('A list of pairs is expected')
+        numeric = [config.use_cols[k] for k in self.keys if config.col_dtypes.get(k, 'str') != 'str']
+        for p in pairs:
+            missing = [c for c in self.columns if c not in p] if isinstance(p, dict) else self.columns
+            if missing: raise ValueError(f'Pairs should have the {missing} fields')
+
+            for c in numeric:
+                try:
+                    if p[c] is not None: float(p[c])
+                except (TypeError, ValueError):
+                    raise ValueError(f'The {c} field should be a number, not {p[c]!r}')
+
+    async def score(self, pairs):
+        """Score ``pairs``, a list of dicts, within the next batch and return the probability of each one to match.
+
+        Raises
+        ------
+        ValueError
+            If ``pairs`` are invalid, see :meth:`validate`.
+        """
+        start = time.perf_counter()
+        # invalid pairs are rejected before they fail the rest of their batch
+        self.validate(pairs)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((pairs, future))
+        scores = await future
+
+        self.latencies.append(time.perf_counter() - start)
+        return scores
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0: break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                size += len(batch[-1][0])
+
+            records = [p for pairs, _ in batch for p in pairs]
+            try:
+                scores = await loop.run_in_executor(self._executor, self._predict, records) if records else []
+            except Exception as e:
+                # the requests of a failed batch are scored on their own, so that only the failing ones fail
+                if len(batch) == 1:
+                    if not batch[0][1].done(): batch[0][1].set_exception(e)
+                    continue
+
+                for pairs, future in batch:
+                    try:
+                        result = await loop.run_in_executor(self._executor, self._predict, pairs) if pairs else []
+                    except Exception as err:
+                        if not future.done(): future.set_exception(err)
+                    else:
+                        if not future.done(): future.set_result(result)
+                continue
+
+            self.batch_sizes.append(len(records))
+            pos = 0
+            for pairs, future in batch:
+                if not future.done(): future.set_result(scores[pos:pos + len(pairs)])
+                pos += len(pairs)
+
+    def stats(self):
+        """Return the number of recent requests, the percentiles of their latency in milliseconds, the mean number
+        of pairs per batch and, with a cascade, the fraction of all the scored pairs that were escalated.
+        """
+        if not self.latencies: return dict(requests=0)
+
+        p50, p90, p99 = np.percentile(np.asarray(self.latencies) * 1000, [50, 90, 99])
+        stats = dict(
+            requests=len(self.latencies), p50_ms=p50, p90_ms=p90, p99_ms=p99,
+            max_ms=max(self.latencies) * 1000, mean_batch_size=float(np.mean(self.batch_sizes)),
+        )
+        if self.cascade: stats['escalated'] = self.bundle.cascade.escalated / max(self.bundle.cascade.scored, 1)
+
+        return stats
+
+    async def start(self, host='127.0.0.1', port=8000, path=None):
+        """Start serving the HTTP API on ``host``:``port``, or on the Unix socket ``path`` if given.
+
+        Returns
+        -------
+        :class:`asyncio.Server`
+            The started server.
+        """
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+
+        if path is not None: return await asyncio.start_unix_server(self._handle, path=path)
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def stop(self, server):
+        """Close ``server`` and stop batching."""
+        server.close()
+        await server.wait_closed()
+        self._batcher.cancel()
+        self._executor.shutdown()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                method, target = line.decode('latin-1').split()[:2]
+
+                headers = dict()
+                while True:
+                    h = await reader.readline()
+                    if h in [b'\r\n', b'\n', b'']: break
+                    k, v = h.decode('latin-1').split(':', 1)
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, payload = await self._route(method, target, body)
+                data = json.dumps(payload).encode('utf8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive: break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, body):
+        if method == 'GET' and target == '/health': return '200 OK', dict(status='ok')
+        if method == 'GET' and target == '/stats': return '200 OK', self.stats()
+        if method != 'POST' or target != '/score': return '404 Not Found', dict(error=f'{method} {target} is not found')
+
+        try:
+            pairs = json.loads(body)
+            if isinstance(pairs, dict): pairs = pairs['pairs']
+            self.validate(pairs)
+        except (ValueError, KeyError) as e:
+            return '400 Bad Request', dict(error=f'Invalid request: {e}')
+
+        try:
+            scores = await self.score(pairs)
+        except Exception as e:
+            return '500 Internal Server Error', dict(error=repr(e))
+
+        return '200 OK', dict(scores=np.asarray(scores).tolist(), pred=(np.asarray(scores) >= 0.5).astype(int).tolist())
+
+
+def serve(bundle, host='127.0.0.1', port=8000, path=None, clf=None, cascade=False):
+    """Load the model bundle in folder ``bundle`` and serve it with :class:`ScoringService` until interrupted."""
+    service = ScoringService(ModelBundle.load(bundle), clf, cascade=cascade)
+
+    async def run():
+        server = await service.start(host, port, path)
+        print(f'Scoring pairs on {path if path is not None else f"http://{host}:{port}"}')
+        try:
+            await server.serve_forever()
+        finally:
+            await service.stop(server)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    print(f'Latency of served requests: {service.stats()}')